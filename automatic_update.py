@@ -1,18 +1,22 @@
 # This file automatically updates the bibliography with GitHub Actions
+import os
+import time
 import logging
-import requests
+from datetime import date
 import truststore
-import feedparser
-from bs4 import BeautifulSoup
-import pybtex.scanner
-from src.scraper import get_publications_from_issue, enrich_publications
-from pybtex.database import BibliographyData
-from pybtex.database import parse_string as bibtex_parse_string
-from unidecode import unidecode
-from src.utils import MATHONCO_BIB_FILE, get_parsed_bibliography
+from src.utils import MATHONCO_BIB_FILE
+from src.storage import atomic_write, append_issue, materialize
+from src.issue_dates import record_issue_date
+from src.http_client import get_default_client
+from src.feed import fetch_feed, latest_feed_issue, save_feed_state
+from src.metrics import get_default_metrics, write_report_at_exit
 
 logging.basicConfig(level=logging.INFO)
 
+# issues extracted and enriched at the same time, and threads enriching each issue
+ISSUE_JOBS = int(os.environ.get("MATHONCO_JOBS", 8))
+ISSUE_WORKERS = int(os.environ.get("MATHONCO_WORKERS", 1))
+
 # Verify TLS certs against the OS trust store (macOS Keychain / Windows cert
 # store / OpenSSL default on Linux) instead of certifi's bundled roots. On
 # machines behind a TLS-intercepting proxy (e.g. Netskope), the interception
@@ -20,118 +24,158 @@ logging.basicConfig(level=logging.INFO)
 # default verification.
 truststore.inject_into_ssl()
 
-### --- Initialize Feed --- ###
-mathonco_feed = feedparser.parse("https://thisweekmathonco.substack.com/feed")
-logging.info(f"bozo: {mathonco_feed.bozo}")
-logging.info(f"status: {getattr(mathonco_feed, 'status', None)}")
-logging.info(f"entries: {len(getattr(mathonco_feed, 'entries', []))}")
-logging.info(f"version: {getattr(mathonco_feed, 'version', None)}")
-logging.info(f"bozo_exception: {getattr(mathonco_feed, 'bozo_exception', None)}")
+# write the run metrics to metrics/automatic_update.json at exit
+metrics = get_default_metrics()
+write_report_at_exit("automatic_update")
+
+### --- Complete an interrupted run, if any --- ###
+with metrics.stage("materialize"):
+    materialize(MATHONCO_BIB_FILE)
 
 ### --- Read Latest Saved Issue Number --- ###
 with open(MATHONCO_BIB_FILE, "r") as f:
     latest_issue = f.readline().strip()
 latest_issue_number = int(latest_issue.split(" ")[-1])
 
-## --- Get parsed bibliography --- ###
-full_bib_content_parsed = get_parsed_bibliography()
-logging.info(f"Loaded {len(full_bib_content_parsed.entries)} entries from the bibliography.")
+### --- Initialize Feed (conditional GET, 304 if unchanged since the last run) --- ###
+with metrics.stage("feed_fetch"):
+    feed_response = fetch_feed(latest_issue_number)
+logging.info(f"status: {None if feed_response is None else feed_response.status_code}")
 
 ### --- Find new issues, if any --- ###
 new_issues = []
-for issue in mathonco_feed.entries:
-    issue_number = issue.title.split(" ")[-1]
-    issue_number = int(issue_number)
-    if issue_number > latest_issue_number:
-        new_issues.append(issue)
-        logging.info(f"New issue found: {issue_number}")
+no_feed_body = (feed_response is None) or (feed_response.status_code == 304)
+feed_latest_issue = None if no_feed_body else latest_feed_issue(feed_response.content)
+if feed_response is None:
+    logging.info("Feed not available, trying again on the next run.")
+elif feed_response.status_code == 304:
+    logging.info("Feed not modified since the last run.")
+elif (feed_latest_issue is not None) and (feed_latest_issue <= latest_issue_number):
+    # no need to parse the whole feed
+    logging.info(f"Latest issue in the feed is {feed_latest_issue}.")
+else:
+    # feedparser, pybtex, the scraper (bs4, numpy) and the search index are only imported if the feed changed
+    import feedparser
+    with metrics.stage("feed_parse"):
+        mathonco_feed = feedparser.parse(feed_response.content, response_headers=dict(feed_response.headers))
+    logging.info(f"bozo: {mathonco_feed.bozo}")
+    logging.info(f"entries: {len(getattr(mathonco_feed, 'entries', []))}")
+    logging.info(f"version: {getattr(mathonco_feed, 'version', None)}")
+    logging.info(f"bozo_exception: {getattr(mathonco_feed, 'bozo_exception', None)}")
+
+    for issue in mathonco_feed.entries:
+        issue_number = issue.title.split(" ")[-1]
+        issue_number = int(issue_number)
+        if issue_number > latest_issue_number:
+            new_issues.append(issue)
+            logging.info(f"New issue found: {issue_number}")
 
 # Inform the user if no new issue is found
 if len(new_issues) == 0:
     logging.info(f"No new issue found. Latest issue is {latest_issue_number}.")
-
-# reverse to start from the oldest
-new_issues = sorted(new_issues, key=lambda x: int(x.title.split(" ")[-1]))
-
-### --- Iterate on issues until you find the last --- ###
-for issue in new_issues:
-    ### --- Get issue number --- ###
-    new_issue_number = issue.title.split(" ")[-1]
-    new_issue_number = int(new_issue_number)
-    logging.info(f"Processing issue {new_issue_number}...")
-
-    ### --- If new issue exist, extract publications --- ###
-    mathonco_issue_html = issue.content[0].value  # get html
-    html_soup = BeautifulSoup(mathonco_issue_html, 'html.parser')
-    new_issue_dict = get_publications_from_issue(html_soup, new_issue_number)
-    new_issue_dict = enrich_publications(new_issue_dict, new_issue_number)
+    processed_issues = []
+else:
+    import pybtex.scanner
+    from pybtex.database import BibliographyData
+    from pybtex.database import parse_string as bibtex_parse_string
+    from src.scraper import process_issues
+    from src.title_index import get_default_title_index
+    from src.utils import get_parsed_bibliography, get_bibtex_label
+
+    ## --- Get parsed bibliography, only to check the labels of the new entries --- ###
+    with metrics.stage("bibliography_parse"):
+        full_bib_content_parsed = get_parsed_bibliography()
+    metrics.count("entries", len(full_bib_content_parsed.entries))
+    logging.info(f"Loaded {len(full_bib_content_parsed.entries)} entries from the bibliography.")
+
+    # reverse to start from the oldest
+    new_issues = sorted(new_issues, key=lambda x: int(x.title.split(" ")[-1]))
+
+    ### --- Extract and enrich all new issues concurrently, then write them from the oldest --- ###
+    # the writer gets the issues in ascending order, so labels are deduplicated in the same order as a sequential
+    # run. Threads only: a process pool would run this script again in its workers where processes are spawned.
+    pending_issues = [(issue.content[0].value, int(issue.title.split(" ")[-1])) for issue in new_issues]
+    feed_issues = {issue_number: issue for (_, issue_number), issue in zip(pending_issues, new_issues)}
+    jobs = min(ISSUE_JOBS, len(pending_issues))
+    processed_issues = process_issues(pending_issues, "bibtex", ISSUE_WORKERS, jobs, ordered=True, processes=False)
+
+for new_issue_number, new_issue_dict in processed_issues:
+    issue = feed_issues[new_issue_number]
+    logging.info(f"Writing issue {new_issue_number}...")
+    metrics.count("issues")
+    metrics.count("papers", len(new_issue_dict[new_issue_number]))
 
     ### --- Create string with formatted bibliography --- ###
-    formatted_bib = f"//MathOnco Issue {new_issue_number}\n"
-    for pub in new_issue_dict[new_issue_number]:
-        # get bibtex
-        pub_bib = pub.get("bibtex")
-
-        # if None, skip
-        if pub_bib is None:
-            continue
-
-        # parse
-        try:
-            parsed_bibtex = bibtex_parse_string(pub_bib, "bibtex")
-        except pybtex.scanner.TokenRequired:
-            logging.error(f"Something wrong with the entry: {pub_bib}")
-            raise pybtex.scanner.TokenRequired
-        # get bibtex label and entry
-        bib_label, bib_entry = list(parsed_bibtex.entries.items())[0]
+    with metrics.stage("bibtex_format"):
+        formatted_bib = f"//MathOnco Issue {new_issue_number}\n"
+        for pub in new_issue_dict[new_issue_number]:
+            # get bibtex
+            pub_bib = pub.get("bibtex")
+
+            # if None, skip
+            if pub_bib is None:
+                continue
+
+            # parse
+            try:
+                parsed_bibtex = bibtex_parse_string(pub_bib, "bibtex")
+            except pybtex.scanner.TokenRequired:
+                logging.error(f"Something wrong with the entry: {pub_bib}")
+                raise pybtex.scanner.TokenRequired
+            # get bibtex label and entry
+            bib_label, bib_entry = list(parsed_bibtex.entries.items())[0]
         
-        # create label in the format surnameYEARfirstword, where:
-        # - surname is the surname of the first author
-        # - YEAR is the year of the paper
-        # - first word is the first word of the title
-
-        # get surname
-        authors_list = list(bib_entry.persons.values())
-        if len(authors_list) == 0:
-            continue
-        first_author_surname = authors_list[0][0].last_names[0]
-        first_author_surname = first_author_surname.lower()
-        first_author_surname = unidecode(first_author_surname)
-        # get year
-        year = bib_entry.fields["year"]
-        # get first_word
-        first_word, _ = bib_entry.fields["title"].split(" ", 1)
-        if len(first_word) <= 3:
-            word_1, word_2, _ = bib_entry.fields["title"].split(" ", 2)
-            first_word = f"{word_1}{word_2}"
-        first_word = first_word.lower()
-                    
-        # set label of the bibtex
-        bibtex_label = f"{first_author_surname}{year}{first_word}"
-
-        # check if already in the bibliography, if so, skip
-        if bibtex_label in full_bib_content_parsed.entries:
-            logging.warning(f"Entry {bibtex_label} already exists in the bibliography. Skipping.")
-            continue
-
-        # else, add to the bibliography
-        parsed_bibtex = BibliographyData({
-            bibtex_label: bib_entry
-        })
-        full_bib_content_parsed.add_entry(bibtex_label, bib_entry)
-        formatted_bib += parsed_bibtex.to_string('bibtex')
-        formatted_bib += "\n"
+            # create label in the format surnameYEARfirstword (skip entries without authors)
+            bibtex_label = get_bibtex_label(bib_entry)
+            if bibtex_label is None:
+                continue
+
+            # check if already in the bibliography, if so, skip
+            if bibtex_label in full_bib_content_parsed.entries:
+                logging.warning(f"Entry {bibtex_label} already exists in the bibliography. Skipping.")
+                continue
+
+            # else, add to the bibliography
+            parsed_bibtex = BibliographyData({
+                bibtex_label: bib_entry
+            })
+            full_bib_content_parsed.add_entry(bibtex_label, bib_entry)
+            metrics.count("entries_added")
+            formatted_bib += parsed_bibtex.to_string('bibtex')
+            formatted_bib += "\n"
 
     ### --- Write formatted bibliography to file --- ###
     # write single issue to file
     single_issue_file = f"res/single_issues/issue_{new_issue_number}.bib"
-    with open(single_issue_file, "w") as f:
-        f.write(formatted_bib)
-
-    # prepend complete file
-    with open(MATHONCO_BIB_FILE, "r") as f:
-        big_bib = f.read()
-    with open(MATHONCO_BIB_FILE, "w") as f:
-        f.write(formatted_bib)
-        f.write(big_bib)
-
+    with metrics.stage("write"):
+        atomic_write(single_issue_file, formatted_bib)
+
+        # record the issue date, used to split the bibliography per year
+        published = issue.get("published_parsed")
+        issue_date = date.today().isoformat() if published is None else time.strftime("%Y-%m-%d", published)
+        record_issue_date(new_issue_number, issue_date)
+
+        # append issue to the journal
+        append_issue(new_issue_number, formatted_bib)
+
+### --- Prepend the new issues to the complete file (single write) --- ###
+with metrics.stage("materialize"):
+    materialize(MATHONCO_BIB_FILE)
+
+### --- Remember the feed, so that the next run can skip it if unchanged --- ###
+if len(new_issues) > 0:
+    latest_issue_number = int(new_issues[-1].title.split(" ")[-1])
+save_feed_state(feed_response, latest_issue_number)
+
+### --- Add the new issues to the search index, if there is one --- ###
+if len(new_issues) > 0:
+    from src.search import INDEX_DIR, SearchIndex
+    if (INDEX_DIR / "manifest.json").exists():
+        with metrics.stage("search_index"):
+            SearchIndex(INDEX_DIR).update(MATHONCO_BIB_FILE)
+
+
+### --- Report how many Crossref queries were saved --- ###
+if len(new_issues) > 0:
+    logging.info(get_default_title_index().stats())
+logging.info(f"HTTP requests:\n{get_default_client().summary()}")
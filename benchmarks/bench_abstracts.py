@@ -0,0 +1,44 @@
+"""
+Abstract retrieval: one OpenAlex request per DOI vs. batched requests, against a local stand-in server.
+
+    python -m benchmarks.bench_abstracts --dois 500 --latency 0.05
+"""
+import time
+import logging
+import argparse
+import src.cache
+import src.postprocessing as postprocessing
+from benchmarks.stub_openalex import start_stub_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark abstract retrieval against a stub OpenAlex")
+    parser.add_argument("--dois", type=int, default=500, help="Number of DOIs")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latency of the stub server (s)")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    # always go to the (stub) network
+    src.cache.CACHE_FILE = "off"
+    server = start_stub_server(latency=args.latency)
+    postprocessing.OPENALEX_API_URL = f"http://127.0.0.1:{server.server_port}"
+
+    dois = [f"10.5555/Stub.{i}" for i in range(args.dois)] + [None, " "]
+
+    start = time.perf_counter()
+    per_doi = {doi: postprocessing._get_crossref_abstract(doi) for doi in dois}
+    per_doi_time = time.perf_counter() - start
+    per_doi_requests, server.n_requests = server.n_requests, 0
+
+    start = time.perf_counter()
+    batched = postprocessing.get_abstracts(dois)
+    batched_time = time.perf_counter() - start
+
+    assert batched == per_doi, "Batched abstracts differ from the per-DOI ones"
+    print(f"per DOI: {per_doi_time:7.2f} s  {per_doi_requests} requests")
+    print(f"batched: {batched_time:7.2f} s  {server.n_requests} requests")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Duplicate report (`src.dedup`) on synthetic issues.json corpora up to 100x the bibliography.
+
+Papers get random titles made of the words of the real titles and unique DOIs; some of them are then repeated
+in a later issue with the DOI written differently, without DOI and with a typo in the title, or with an
+unchanged title and no DOI. The report must find exactly these duplicates, and the time per paper must not
+grow with the corpus size.
+
+    python -m benchmarks.bench_dedup --scales 1 10 100
+"""
+import sys
+import time
+import random
+import argparse
+from src.dedup import find_duplicates, iter_bibliography_records, iter_issues_records
+from src.utils import MATHONCO_BIB_FILE
+
+
+# fraction of papers repeated in a later issue
+DUPLICATE_RATE = 0.05
+
+# maximum growth of the time per paper between the smallest and the largest scale
+MAX_SLOWDOWN = 3.0
+
+
+def _typo(rng: random.Random, title: str) -> str:
+    position = rng.randrange(len(title))
+    return title[:position] + title[position + 1:]
+
+
+def make_issues(scale: int, seed: int = 0) -> tuple:
+    """
+    Synthetic issues dict with `scale` times the papers of the bibliography, and the set of the positions
+    (in record order) of the injected duplicates.
+    """
+    rng = random.Random(seed)
+    records = list(iter_bibliography_records(MATHONCO_BIB_FILE))
+    words = sorted({word for record in records for word in record["title"].split()})
+    n_issues = max(record["issue"] for record in records) * scale
+    n_papers = len(records) * scale
+
+    papers = []
+    for i in range(n_papers):
+        title = " ".join(rng.choices(words, k=rng.randint(6, 16)))
+        papers.append([rng.randrange(1, n_issues + 1), {"title": title, "link": "", "DOI": f"10.5555/synthetic.{i}"}])
+    for original in rng.sample(range(n_papers), int(DUPLICATE_RATE * n_papers)):
+        issue, paper = papers[original]
+        variant = rng.choice(["doi", "typo", "title"])
+        if variant == "doi":
+            duplicate = {"title": paper["title"], "link": "", "DOI": "https://doi.org/" + paper["DOI"].upper()}
+        elif variant == "typo":
+            duplicate = {"title": _typo(rng, paper["title"]), "link": "", "DOI": None}
+        else:
+            duplicate = {"title": paper["title"].upper(), "link": "", "DOI": None}
+        duplicate["original"] = original
+        papers.append([min(issue + rng.randint(1, 10), n_issues + 10), duplicate])
+
+    # newest issues first, as in issues.json
+    issues_dict = {}
+    for issue, paper in sorted(papers, key=lambda p: -p[0]):
+        issues_dict.setdefault(str(issue), []).append(paper)
+    position = {id(paper): i for i, paper in enumerate(p for papers in issues_dict.values() for p in papers)}
+    expected = {frozenset((position[id(paper)], position[id(papers[paper["original"]][1])]))
+                for _, paper in papers if "original" in paper}
+    return issues_dict, expected
+
+
+def check_distinct_dois():
+    """
+    Records with the same title and different DOIs (e.g. preprint and article) must never end up in the same
+    group, whatever the order of the records.
+    """
+    title = "Evolutionary dynamics of resistance under adaptive therapy"
+    records = [{"title": title, "doi": None}, {"title": title, "doi": "10.1101/2024.01.01.000001"},
+               {"title": title, "doi": "10.1038/s41467-024-00001-1"}]
+    for rotation in range(len(records)):
+        rotated = records[rotation:] + records[:rotation]
+        for group in find_duplicates(rotated):
+            dois = {rotated[i]["doi"] for i in group["records"]} - {None}
+            if len(dois) > 1:
+                print(f"Records with different DOIs grouped together: {sorted(dois)}")
+                sys.exit(1)
+    print("records with different DOIs are never grouped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the duplicate report on synthetic corpora")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="Corpus sizes (x bibliography)")
+    args = parser.parse_args()
+
+    check_distinct_dois()
+    times_per_paper = []
+    for scale in args.scales:
+        issues_dict, expected = make_issues(scale)
+        records = list(iter_issues_records(issues_dict))
+        start = time.perf_counter()
+        groups = find_duplicates(records)
+        elapsed = time.perf_counter() - start
+        found = {frozenset(group["records"]) for group in groups}
+        times_per_paper.append(elapsed / len(records))
+        print(f"{scale:4d}x {len(records):8d} papers  {elapsed:7.2f} s  {times_per_paper[-1] * 1e6:6.1f} us/paper  "
+              f"{len(found & expected)} / {len(expected)} duplicates found, {len(found - expected)} false")
+        if found != expected:
+            print("The report does not match the injected duplicates")
+            sys.exit(1)
+
+    slowdown = times_per_paper[-1] / times_per_paper[0]
+    print(f"time per paper: x{slowdown:.2f} from {args.scales[0]}x to {args.scales[-1]}x")
+    if slowdown > MAX_SLOWDOWN:
+        print(f"The duplicate report is not linear (slowdown above x{MAX_SLOWDOWN})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
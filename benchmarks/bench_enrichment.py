@@ -0,0 +1,54 @@
+"""
+Throughput of `enrich_publications`, sequential vs. concurrent, against the local stub server.
+
+    python -m benchmarks.bench_enrichment --papers 40 --latency 0.1 --workers 1 4 8
+"""
+import time
+import copy
+import logging
+import argparse
+import src.cache
+import src.scraper as scraper
+from src.http_client import HttpClient
+from benchmarks.stub_crossref import start_stub_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent enrichment against a stub Crossref")
+    parser.add_argument("--papers", type=int, default=40, help="Number of papers in the synthetic issue")
+    parser.add_argument("--latency", type=float, default=0.1, help="Latency of the stub server (s)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8], help="Worker counts to compare")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # always go to the (stub) network
+    src.cache.CACHE_FILE = "off"
+
+    # start stub and point the scraper to it
+    server = start_stub_server(latency=args.latency)
+    stub_url = f"http://127.0.0.1:{server.server_port}"
+    scraper.CROSSREF_API_URL = stub_url
+    scraper.DOI_RESOLVER_URL = stub_url
+
+    # build synthetic issue
+    issue_number = 0
+    issue_dict = {issue_number: [{"title": f"Synthetic mathematical oncology paper number {i}", "link": ""}
+                                 for i in range(args.papers)]}
+
+    reference = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        result = scraper.enrich_publications(copy.deepcopy(issue_dict), issue_number,
+                                             workers=workers, client=HttpClient())
+        elapsed = time.perf_counter() - start
+        # check that the output matches the first (sequential) run
+        if reference is None:
+            reference = result
+        assert result == reference, f"Output with {workers} workers differs from the reference"
+        print(f"workers={workers:3d}  {elapsed:7.2f} s  {args.papers / elapsed:7.2f} papers/s")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Entry splitting: char-by-char brace scan (previous `_iter_issue_entries`) vs. the mmap streaming splitter.
+
+    python -m benchmarks.bench_entry_splitter --scales 1 10 100
+"""
+import re
+import time
+import logging
+import argparse
+from itertools import zip_longest
+import tempfile
+from pathlib import Path
+from src.bibstream import iter_issue_entries
+from benchmarks.synthetic import write_bibliography
+
+
+def legacy_iter_issue_entries(bib_text: str):
+    """
+    Previous implementation of `postprocessing._iter_issue_entries`.
+    """
+    issue_pattern = re.compile(r"//MathOnco Issue\s+(\d+)\s*\n")
+    issue_matches = list(issue_pattern.finditer(bib_text))
+
+    for i, issue_match in enumerate(issue_matches):
+        issue_number = int(issue_match.group(1))
+        start = issue_match.end()
+        end = issue_matches[i + 1].start() if i + 1 < len(issue_matches) else len(bib_text)
+        issue_block = bib_text[start:end]
+
+        for entry_match in re.finditer(r"@\w+\s*{", issue_block):
+            entry_start = entry_match.start()
+            brace_level = 0
+            entry_end = None
+            for pos, char in enumerate(issue_block[entry_start:], start=entry_start):
+                if char == "{":
+                    brace_level += 1
+                elif char == "}":
+                    brace_level -= 1
+                    if brace_level == 0:
+                        entry_end = pos + 1
+                        break
+
+            if entry_end is None:
+                logging.warning(f"Could not parse one entry in issue {issue_number}.")
+                continue
+
+            yield issue_number, issue_block[entry_start:entry_end]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bibliography entry splitter")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="Corpus sizes (x real corpus)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in args.scales:
+            corpus = Path(tmp_dir) / f"corpus_{scale}.bib"
+            write_bibliography(corpus, scale)
+
+            start = time.perf_counter()
+            with open(corpus, "r") as f:
+                legacy = list(legacy_iter_issue_entries(f.read()))
+            legacy_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            n_identical = sum(new == old for new, old in zip_longest(iter_issue_entries(corpus), legacy))
+            streaming_time = time.perf_counter() - start
+
+            assert n_identical == len(legacy), "Streaming splitter output differs from the legacy one"
+            print(f"{scale:4d}x  {len(legacy):8d} entries  legacy {legacy_time:7.2f} s  "
+                  f"streaming {streaming_time:7.2f} s  speedup {legacy_time / streaming_time:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Publication extraction from issue html: previous next/previous intersection vs. single-pass walk, parsing the
+full document or only the relevant tags.
+
+    python -m benchmarks.bench_issue_extraction --repeat 20
+"""
+import time
+import logging
+import argparse
+from pathlib import Path
+from bs4 import BeautifulSoup
+from src.scraper import find_issue_sections, get_publications_from_issue, make_issue_soup
+from benchmarks.synthetic import issue_html
+
+
+SAVED_ISSUES = {353: Path("test_issue_353.html")}
+
+
+def legacy_publications(soup: BeautifulSoup, issue_number: int) -> list:
+    """
+    Previous extraction: intersection of the 'a' tags after the publications section and before the following one.
+    """
+    section_publications, following_section = find_issue_sections(soup, issue_number)
+    if (section_publications is None) or (following_section is None):
+        return []
+    all_next_a = section_publications.find_all_next('a')
+    all_prevous_a = following_section.find_all_previous('a')
+    intersection = list(set(all_next_a).intersection(all_prevous_a))
+    publications = [element for element in intersection
+                    if ('class' not in element.attrs.keys())]
+    return [{"title": p.text, "link": p.get('href')} for p in publications]
+
+
+def extraction_inputs() -> dict:
+    """
+    Saved issues plus one synthetic issue per layout era.
+    """
+    inputs = {number: path.read_text() for number, path in SAVED_ISSUES.items() if path.exists()}
+    for number in (100, 200, 360):
+        inputs[number] = issue_html(number, n_papers=30)
+    return inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the extraction of publications from issue html")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions for each issue")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    sort_key = lambda p: (p["link"], p["title"])
+    for issue_number, html in extraction_inputs().items():
+        timings = {}
+        results = {}
+        variants = {
+            "legacy": lambda: legacy_publications(BeautifulSoup(html, "html.parser"), issue_number),
+            "single pass": lambda: get_publications_from_issue(make_issue_soup(html), issue_number)[issue_number],
+            "single pass, strainer": lambda: get_publications_from_issue(
+                make_issue_soup(html, only_relevant=True), issue_number)[issue_number],
+        }
+        for name, extract in variants.items():
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                results[name] = extract()
+            timings[name] = (time.perf_counter() - start) / args.repeat
+
+        # same papers as before, now in document order
+        assert sorted(results["single pass"], key=sort_key) == sorted(results["legacy"], key=sort_key)
+        assert results["single pass, strainer"] == results["single pass"]
+        print(f"issue {issue_number}: {len(results['legacy'])} papers  " +
+              "  ".join(f"{name} {t * 1000:6.1f} ms" for name, t in timings.items()))
+
+
+if __name__ == "__main__":
+    main()
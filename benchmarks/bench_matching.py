@@ -0,0 +1,125 @@
+"""
+Title matching in `get_doi`: per-candidate SequenceMatcher loop vs. batched q-gram scoring.
+
+Runs on recorded Crossref responses. Record them once (network needed) with:
+    python -m benchmarks.bench_matching --record --titles 30
+Without a recording, responses are synthesized from the titles of the bibliography.
+"""
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from difflib import SequenceMatcher
+import requests
+from src.matching import best_match
+from src.scraper import CROSSREF_ROWS
+from src.title_index import _iter_title_doi
+from src.utils import MATHONCO_BIB_FILE
+
+
+RECORDING_FILE = Path("benchmarks/data/crossref_responses.json")
+
+# page size used by the old loop (crossref.restful.LIMIT)
+LEGACY_PAGE_SIZE = 100
+
+
+def legacy_match(title: str, items: list) -> tuple:
+    """
+    Previous implementation of `get_doi`: return (DOI, n. of page requests).
+    """
+    format_title = lambda s: s.replace(" ", "").lower()
+    formatted_title = format_title(title)
+    search_limit = 100
+    for i, element in enumerate(items):
+        try:
+            formatted_element_title = format_title(element["title"][0])
+        except KeyError:
+            continue
+        sm = SequenceMatcher(None, formatted_element_title, formatted_title)
+        if sm.ratio() > 0.90:
+            return element["DOI"], i // LEGACY_PAGE_SIZE + 1
+        if i > search_limit:
+            return None, i // LEGACY_PAGE_SIZE + 1
+    return None, len(items) // LEGACY_PAGE_SIZE + 1
+
+
+def record(n_titles: int, seed: int = 0):
+    """
+    Record the first two pages of Crossref results for titles sampled from the bibliography.
+    """
+    titles = [title for title, _ in _iter_title_doi(MATHONCO_BIB_FILE)]
+    random.Random(seed).shuffle(titles)
+    recording = []
+    for title in titles[:n_titles]:
+        items = []
+        for offset in (0, LEGACY_PAGE_SIZE):
+            response = requests.get("https://api.crossref.org/works", timeout=30,
+                                    params={"query.bibliographic": title, "select": "DOI,title",
+                                            "rows": LEGACY_PAGE_SIZE, "offset": offset})
+            response.raise_for_status()
+            items.extend(response.json()["message"]["items"])
+        recording.append({"title": title, "items": items})
+    RECORDING_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(RECORDING_FILE, "w") as f:
+        json.dump(recording, f)
+    print(f"Recorded {len(recording)} responses to {RECORDING_FILE}")
+
+
+def synthesize(n_titles: int, seed: int = 0) -> list:
+    """
+    Crossref-like responses built from the bibliography: other titles as decoys, with the matching
+    title (slightly altered) anywhere in the first page, or missing altogether for some queries.
+    """
+    rng = random.Random(seed)
+    works = list(_iter_title_doi(MATHONCO_BIB_FILE))
+    recording = []
+    for title, doi in rng.sample(works, n_titles):
+        items = [{"title": [t], "DOI": d} for t, d in rng.sample(works, 2 * LEGACY_PAGE_SIZE) if t != title]
+        if rng.random() < 0.8:
+            items.insert(rng.randrange(LEGACY_PAGE_SIZE), {"title": [title.rstrip(".") + "."], "DOI": doi})
+        recording.append({"title": title, "items": items})
+    return recording
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark title matching on recorded Crossref responses")
+    parser.add_argument("--record", action="store_true", help="Record responses from Crossref")
+    parser.add_argument("--titles", type=int, default=200, help="Number of titles")
+    parser.add_argument("--rows", type=int, default=CROSSREF_ROWS, help="Rows requested by the batched matcher")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.titles)
+        return
+    if RECORDING_FILE.exists():
+        with open(RECORDING_FILE, "r") as f:
+            recording = json.load(f)
+        print(f"Using {len(recording)} recorded responses from {RECORDING_FILE}")
+    else:
+        recording = synthesize(args.titles)
+        print(f"Using {len(recording)} responses synthesized from {MATHONCO_BIB_FILE}")
+
+    # old loop
+    start = time.perf_counter()
+    legacy = [legacy_match(r["title"], r["items"]) for r in recording]
+    legacy_time = time.perf_counter() - start
+    legacy_requests = sum(n for _, n in legacy)
+
+    # batched matcher
+    start = time.perf_counter()
+    batched = [best_match(r["title"], r["items"][:args.rows]) for r in recording]
+    batched_time = time.perf_counter() - start
+    batched = [None if item is None else item["DOI"] for item in batched]
+
+    agree = sum(old == new for (old, _), new in zip(legacy, batched))
+    legacy_found = sum(old is not None for old, _ in legacy)
+    recall = sum((old is not None) and (old == new) for (old, _), new in zip(legacy, batched))
+    print(f"legacy loop: {legacy_time * 1000:8.1f} ms  {legacy_requests} page requests")
+    print(f"batched:     {batched_time * 1000:8.1f} ms  {len(recording)} requests (rows={args.rows})")
+    print(f"same DOI for {agree} / {len(recording)} titles, recall {recall} / {legacy_found} of the DOIs found by "
+          f"the legacy loop")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Run time of `automatic_update.py` when there is no new issue, which is most weeks.
+
+A local server stands in for Substack: it serves a feed whose latest issue is already in the bibliography, with
+an ETag, and answers 304 when the ETag is sent back. The script runs twice in a temporary copy of `res/`: the
+first run gets the feed (and only reads the item titles), the second one gets a 304. The time after imports is
+the run time minus the time of a process running only the imports of the script; the script exits with status
+1 if it is above the budget.
+
+    python -m benchmarks.bench_noop --budget 0.5
+"""
+import os
+import ast
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.issue_dates import ISSUE_DATES_FILE
+from src.utils import MATHONCO_BIB_FILE
+from benchmarks.bench_replay import feed_xml
+from benchmarks.synthetic import issue_html
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+ETAG = '"mathonco-feed"'
+
+
+def imports_only(script: Path) -> str:
+    """
+    Source with only the top-level imports of the script.
+    """
+    tree = ast.parse(script.read_text())
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return ast.unparse(ast.Module(body=imports, type_ignores=[]))
+
+
+def timed_run(command: list, cwd: Path, env: dict, repeat: int = 3) -> float:
+    """
+    Best wall time of `repeat` runs of the command (s).
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def make_handler(feed: bytes):
+    class FeedHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.send_header("ETag", ETAG)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/rss+xml")
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", str(len(feed)))
+            self.end_headers()
+            self.wfile.write(feed)
+
+        def log_message(self, *args):
+            pass
+
+    return FeedHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark automatic_update.py when there is no new issue")
+    parser.add_argument("--issues", type=int, default=20, help="Issues in the feed")
+    parser.add_argument("--budget", type=float, default=0.5, help="Maximum time after imports (s)")
+    args = parser.parse_args()
+
+    with open(MATHONCO_BIB_FILE, "r") as f:
+        latest_issue_number = int(f.readline().split(" ")[-1])
+    feed = feed_xml({issue_number: issue_html(issue_number) for issue_number in
+                     range(latest_issue_number - args.issues + 1, latest_issue_number + 1)}).encode()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(feed))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    over_budget = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        (tmp_dir / "res").mkdir()
+        shutil.copy(MATHONCO_BIB_FILE, tmp_dir / "res")
+        shutil.copy(ISSUE_DATES_FILE, tmp_dir / "res")
+        env = dict(os.environ, PYTHONPATH=str(REPO_DIR), MATHONCO_HTTP_MODE="live",
+                   MATHONCO_FEED_URL=f"http://127.0.0.1:{server.server_port}/feed",
+                   MATHONCO_CACHE=str(tmp_dir / "cache" / "responses.sqlite"), MATHONCO_METRICS=str(tmp_dir / "metrics"))
+
+        script = REPO_DIR / "automatic_update.py"
+        import_time = timed_run([sys.executable, "-c", imports_only(script)], tmp_dir, env)
+        print(f"{'imports only':22s} {import_time:6.2f} s")
+        # the first run stores the ETag, the next ones get a 304
+        for run, repeat in (("feed unchanged (200)", 1), ("not modified (304)", 3)):
+            elapsed = timed_run([sys.executable, str(script)], tmp_dir, env, repeat)
+            with open(tmp_dir / "metrics" / "automatic_update.json", "r") as f:
+                report = json.load(f)
+            stages = ", ".join(f"{name} {stage['seconds'] * 1000:.1f} ms" for name, stage in report["stages"].items())
+            print(f"{run:22s} {elapsed:6.2f} s  {elapsed - import_time:6.3f} s after imports  ({stages})")
+            over_budget = over_budget or (elapsed - import_time > args.budget)
+        assert (tmp_dir / MATHONCO_BIB_FILE).read_bytes() == MATHONCO_BIB_FILE.read_bytes(), "The bibliography changed"
+    server.shutdown()
+
+    if over_budget:
+        print(f"A run without new issues took more than {args.budget} s after imports")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+End-to-end throughput of `automatic_update.py` and `src.scraper` replaying a synthetic cassette (no network).
+
+The cassette holds a Substack feed with new synthetic issues, the Crossref answers for their titles and the
+BibTeX entries from doi.org. Both scripts run in a temporary copy of `res/`, with the response cache off.
+
+    python -m benchmarks.bench_replay --issues 3 --papers 25 --latency 0.05 --error-rate 0.02
+    python -m benchmarks.bench_replay --issues 10 --papers 10 --jobs 1    # issues one after another
+"""
+import os
+import sys
+import json
+import shutil
+import time
+import logging
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from xml.sax.saxutils import escape
+from habanero.cn_formats import cn_format_headers
+from src.scraper import CROSSREF_API_URL, DOI_RESOLVER_URL, CROSSREF_ROWS, make_issue_soup, get_publications_from_issue
+from src.replay import request_key, make_interaction
+from src.feed import FEED_URL
+from src.utils import MATHONCO_BIB_FILE
+from benchmarks.synthetic import issue_html
+from benchmarks.stub_crossref import stub_doi
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+def stub_entry(doi: str, title: str, n: int) -> str:
+    """
+    BibTeX entry as returned by doi.org, with a different first author for each paper.
+    """
+    return (f" @article{{Stub_{n}, title={{{title}}}, volume={{1}}, DOI={{{doi}}}, journal={{Journal of Stubs}}, "
+            f"author={{Author{n}, Jane and Roe, Richard}}, year={{2024}}, month=jan }}\n")
+
+
+def feed_xml(issues: dict) -> str:
+    """
+    RSS feed with the given issues (issue_number -> html).
+    """
+    items = "".join(f"<item><title>This week in MathOnco {issue_number}</title>"
+                    f"<link>https://thisweekmathonco.substack.com/p/this-week-in-mathonco-{issue_number}</link>"
+                    f"<pubDate>Thu, 01 Oct 2026 18:00:00 GMT</pubDate>"
+                    f"<content:encoded>{escape(html)}</content:encoded></item>"
+                    for issue_number, html in sorted(issues.items(), reverse=True))
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0" '
+            f'xmlns:content="http://purl.org/rss/1.0/modules/content/"><channel><title>MathOnco</title>'
+            f"{items}</channel></rss>")
+
+
+def write_cassette(cassette_file: Path, issues: dict) -> int:
+    """
+    Write the synthetic cassette for the given issues. Return the number of papers.
+    """
+    accept = cn_format_headers["bibtex"]
+    interactions = [make_interaction(request_key(FEED_URL), 200, {"Content-Type": "application/rss+xml"},
+                                     feed_xml(issues).encode())]
+    n_papers = 0
+    for issue_number, html in issues.items():
+        papers = get_publications_from_issue(make_issue_soup(html, only_relevant=True), issue_number)[issue_number]
+        for paper in papers:
+            n_papers += 1
+            doi = stub_doi(paper["title"])
+            works = {"message": {"items": [{"DOI": doi, "title": [paper["title"]]}]}}
+            params = {"query.bibliographic": paper["title"], "select": "DOI,title", "rows": CROSSREF_ROWS}
+            interactions.append(make_interaction(request_key(f"{CROSSREF_API_URL}/works", params), 200,
+                                                 {"Content-Type": "application/json"}, json.dumps(works).encode()))
+            interactions.append(make_interaction(request_key(f"{DOI_RESOLVER_URL}/{doi}", headers={"Accept": accept}),
+                                                 200, {"Content-Type": f"{accept}; charset=utf-8"},
+                                                 stub_entry(doi, paper["title"], n_papers).encode()))
+    with open(cassette_file, "w") as f:
+        f.writelines(json.dumps(interaction) + "\n" for interaction in interactions)
+    return n_papers
+
+
+def run(command: list, work_dir: Path, env: dict) -> float:
+    """
+    Run the command in work_dir and return its wall time (s).
+    """
+    start = time.perf_counter()
+    subprocess.run(command, cwd=work_dir, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark automatic_update.py and the scraper on a replayed cassette")
+    parser.add_argument("--issues", type=int, default=3, help="Number of new synthetic issues")
+    parser.add_argument("--papers", type=int, default=25, help="Papers per issue")
+    parser.add_argument("--latency", default="0.05", help="Replayed latency per request (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with a 503")
+    parser.add_argument("--workers", type=int, default=8, help="Scraper threads per issue")
+    parser.add_argument("--jobs", type=int, default=8, help="Issues processed at the same time by automatic_update.py")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        with open(MATHONCO_BIB_FILE, "r") as f:
+            latest_issue_number = int(f.readline().split(" ")[-1])
+        issues = {issue_number: issue_html(issue_number, n_papers=args.papers)
+                  for issue_number in range(latest_issue_number + 1, latest_issue_number + 1 + args.issues)}
+        cassette_file = tmp_dir / "cassette.jsonl"
+        n_papers = write_cassette(cassette_file, issues)
+
+        env = dict(os.environ, PYTHONPATH=str(REPO_DIR), MATHONCO_CACHE="off", MATHONCO_HTTP_MODE="replay",
+                   MATHONCO_CASSETTE=str(cassette_file), MATHONCO_REPLAY_LATENCY=args.latency,
+                   MATHONCO_REPLAY_ERROR_RATE=str(args.error_rate), MATHONCO_JOBS=str(args.jobs))
+
+        # automatic update, on a copy of the bibliography
+        update_dir = tmp_dir / "update"
+        (update_dir / "res").mkdir(parents=True)
+        shutil.copy(MATHONCO_BIB_FILE, update_dir / "res")
+        elapsed = run([sys.executable, str(REPO_DIR / "automatic_update.py")], update_dir, env)
+        with open(update_dir / MATHONCO_BIB_FILE, "r") as f:
+            new_bib = f.read()
+        assert new_bib.startswith(f"//MathOnco Issue {max(issues)}\n"), "automatic_update.py did not add the issues"
+        assert new_bib.count("@article") >= n_papers, "automatic_update.py did not add all the papers"
+        print(f"automatic_update.py (jobs {args.jobs})  {args.issues} issues  {n_papers} papers  {elapsed:7.2f} s  "
+              f"{n_papers / elapsed:7.2f} papers/s")
+
+        # scraper on the issue html files
+        scraper_dir = tmp_dir / "scraper"
+        (scraper_dir / "res").mkdir(parents=True)
+        (scraper_dir / "issues").mkdir()
+        shutil.copy(MATHONCO_BIB_FILE, scraper_dir / "res")
+        for issue_number, html in issues.items():
+            (scraper_dir / "issues" / f"issue-{issue_number}.html").write_text(html)
+        elapsed = run([sys.executable, "-m", "src.scraper", "--directory", "issues", "--workers", str(args.workers)],
+                      scraper_dir, env)
+        with open(scraper_dir / "out" / "issues.json", "r") as f:
+            assert len(json.load(f)) == args.issues, "The scraper did not process all the issues"
+        print(f"src.scraper (-w {args.workers})  {args.issues} issues  {n_papers} papers  {elapsed:7.2f} s  "
+              f"{n_papers / elapsed:7.2f} papers/s")
+
+
+if __name__ == "__main__":
+    main()
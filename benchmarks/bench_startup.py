@@ -0,0 +1,92 @@
+"""
+Import time of each entry point, measured with `python -X importtime`, against a per-entry-point budget.
+
+Each entry point is imported in a fresh interpreter (for the scripts, only their top-level imports are run). The
+import time is the sum of the cumulative times of the top-level imports after the interpreter startup. An entry
+point fails if it is slower than its budget, or if it imports one of the heavy packages it should only load on
+first use. The script exits with status 1 if any entry point fails.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --scale 2    # slower machine: twice the budgets
+"""
+import os
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+from benchmarks.bench_noop import imports_only
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# entry point -> (import time budget in ms, packages that must not be imported at startup)
+ENTRY_POINTS = {
+    "main.py": (50, ("numpy", "pandas", "pybtex", "requests", "bs4", "tqdm")),
+    "src.interact": (50, ("numpy", "pandas", "pybtex", "requests", "bs4", "tqdm")),
+    "automatic_update.py": (200, ("numpy", "pandas", "pybtex", "bs4", "feedparser", "crossref", "habanero")),
+    "src.utils": (50, ("numpy", "pandas", "pybtex", "requests")),
+    "src.scraper": (350, ("pandas", "crossref", "habanero", "tqdm")),
+    "src.postprocessing": (400, ("pandas", "crossref", "habanero")),
+    "src.catalog": (200, ("pandas", "pybtex", "requests")),
+    "src.authors": (200, ("pandas", "pybtex", "requests")),
+    "src.dedup": (200, ("pandas", "pybtex", "requests")),
+}
+
+
+def import_source(entry_point: str) -> str:
+    if entry_point.endswith(".py"):
+        return imports_only(REPO_DIR / entry_point)
+    return f"import {entry_point}"
+
+
+def measure(entry_point: str) -> tuple:
+    """
+    (import time in s, imported top-level packages) of the entry point, in a new interpreter.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", import_source(entry_point)], cwd=REPO_DIR,
+                            env=dict(os.environ, PYTHONPATH=str(REPO_DIR)), capture_output=True, text=True,
+                            check=True)
+    total, packages = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # the interpreter startup ends with the import of site
+        if name.strip() == "site":
+            total, packages = 0, set()
+            continue
+        packages.add(name.strip().split(".")[0])
+        # top-level imports are not indented
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return total / 1e6, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of the entry points against their budgets")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per entry point (the best one is kept)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply all budgets by this factor")
+    args = parser.parse_args()
+
+    failures = []
+    for entry_point, (budget_ms, forbidden) in ENTRY_POINTS.items():
+        runs = [measure(entry_point) for _ in range(args.repeat)]
+        seconds = min(run[0] for run in runs)
+        loaded = sorted(set(forbidden) & set.union(*(run[1] for run in runs)))
+        budget = budget_ms * args.scale / 1000
+        line = f"{entry_point:22s} {seconds * 1000:7.1f} ms  budget {budget * 1000:6.0f} ms"
+        if seconds > budget:
+            line += "  OVER BUDGET"
+            failures.append(entry_point)
+        if len(loaded) > 0:
+            line += f"  imports {', '.join(loaded)}"
+            failures.append(entry_point)
+        print(line)
+
+    if len(failures) > 0:
+        print(f"Startup budget exceeded by: {', '.join(sorted(set(failures)))}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
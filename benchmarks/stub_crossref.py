@@ -0,0 +1,117 @@
+"""
+Local stub server standing in for Crossref (title queries) and doi.org (content negotiation).
+
+Run it with:
+    python -m benchmarks.stub_crossref --port 8765 --latency 0.2
+
+and point the scraper to it:
+    CROSSREF_API_URL=http://127.0.0.1:8765 DOI_RESOLVER_URL=http://127.0.0.1:8765 python -m src.scraper ...
+"""
+import json
+import time
+import hashlib
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def stub_doi(title: str) -> str:
+    """
+    Deterministic fake DOI for the given title.
+    """
+    return f"10.5555/stub.{hashlib.sha1(title.encode()).hexdigest()[:10]}"
+
+
+def stub_bibtex(doi: str, title: str) -> str:
+    """
+    Fake BibTeX entry, formatted as the one returned by doi.org.
+    """
+    return (f" @article{{Stub_{doi.split('.')[-1]}, title={{{title}}}, volume={{1}}, DOI={{{doi}}}, "
+            f"journal={{Journal of Stubs}}, author={{Doe, Jane and Roe, Richard}}, year={{2024}}, month=jan }}\n")
+
+
+def make_handler(latency: float, n_decoys: int, rate_limit: int, rate_interval: str):
+    """
+    Build the request handler class with the given settings.
+    """
+    # DOIs handed out by the search endpoint
+    known_dois = {}
+    lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        # keep connections alive between requests
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("X-Rate-Limit-Limit", str(rate_limit))
+            self.send_header("X-Rate-Limit-Interval", rate_interval)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            time.sleep(latency)
+            url = urlparse(self.path)
+            if url.path == "/works":
+                # title query: some decoys, followed by the matching work
+                query = parse_qs(url.query)
+                title = query.get("query.bibliographic", [""])[0]
+                offset = int(query.get("offset", ["0"])[0])
+                doi = stub_doi(title)
+                with lock:
+                    known_dois[doi] = title
+                items = [{"DOI": f"10.5555/decoy.{i}", "title": [f"Unrelated work number {i}"]}
+                         for i in range(n_decoys)]
+                items.append({"DOI": doi, "title": [title]})
+                items = items[offset:]
+                body = json.dumps({"status": "ok", "message": {"items": items}}).encode()
+                self._send(200, body, "application/json")
+            else:
+                # content negotiation
+                doi = unquote(url.path[1:])
+                with lock:
+                    title = known_dois.get(doi)
+                if title is None:
+                    self._send(404, b"DOI not found", "text/plain")
+                else:
+                    self._send(200, stub_bibtex(doi, title).encode(), "application/x-bibtex")
+
+    return StubHandler
+
+
+def start_stub_server(port: int = 0, latency: float = 0.05, n_decoys: int = 3,
+                      rate_limit: int = 50, rate_interval: str = "1s") -> ThreadingHTTPServer:
+    """
+    Start the stub server on a background thread and return it. Its url is `f"http://127.0.0.1:{server.server_port}"`.
+    """
+    handler = make_handler(latency, n_decoys, rate_limit, rate_interval)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub server standing in for Crossref and doi.org")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latency of each response (s)")
+    parser.add_argument("--decoys", type=int, default=3, help="Non-matching results returned before the match")
+    parser.add_argument("--rate-limit", type=int, default=50, help="Value of the X-Rate-Limit-Limit header")
+    parser.add_argument("--rate-interval", type=str, default="1s", help="Value of the X-Rate-Limit-Interval header")
+    args = parser.parse_args()
+
+    handler = make_handler(args.latency, args.decoys, args.rate_limit, args.rate_interval)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), handler)
+    print(f"Stub server listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
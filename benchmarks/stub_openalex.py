@@ -0,0 +1,74 @@
+"""
+Local stand-in for the OpenAlex works endpoint, counting the requests it serves.
+
+Every DOI is known to the stub except those ending in "0" (404); DOIs ending in "1" have no abstract.
+"""
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlparse, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def stub_work(doi: str) -> dict:
+    """
+    Work returned for the DOI, or None if the DOI is unknown.
+    """
+    doi = doi.lower()
+    if doi.endswith("0"):
+        return None
+    if doi.endswith("1"):
+        inverted_index = None
+    else:
+        words = ["abstract", "of", doi, hashlib.sha1(doi.encode()).hexdigest()[:8]]
+        inverted_index = {word: [i] for i, word in enumerate(words)}
+    return {"doi": f"https://doi.org/{doi}", "abstract_inverted_index": inverted_index}
+
+
+def start_stub_server(port: int = 0, latency: float = 0.05) -> ThreadingHTTPServer:
+    """
+    Start the stub server on a background thread. The number of requests served is in `server.n_requests`.
+    """
+    lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            with lock:
+                server.n_requests += 1
+            time.sleep(latency)
+            url = urlparse(self.path)
+            prefix = "/works/https://doi.org/"
+            if url.path.startswith(prefix):
+                # single DOI
+                work = stub_work(unquote(url.path[len(prefix):]))
+                if work is None:
+                    self._send_json(404, {"error": "not found"})
+                else:
+                    self._send_json(200, work)
+            else:
+                # filter on many DOIs
+                query = parse_qs(url.query)
+                dois = query["filter"][0].removeprefix("doi:").split("|")
+                works = [work for work in map(stub_work, dois) if work is not None]
+                self._send_json(200, {"meta": {"count": len(works)}, "results": works})
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.n_requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,150 @@
+"""
+Benchmark suite for the bibliography and issue processing, on the real `res/` corpus (scale 1) and on synthetic
+corpora scaled from it. Fully offline. Results are compared with `benchmarks/baseline.json`; the script exits
+with status 1 if a case is slower than its baseline times the regression threshold.
+
+    python -m benchmarks.suite                      # scales 1 and 10
+    python -m benchmarks.suite --scales 1 10 100 1000
+    python -m benchmarks.suite --update-baseline
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import contextlib
+import io
+from pathlib import Path
+from src.utils import (get_parsed_bibliography, get_bibtex_label, split_bib_per_issue, split_single_bib_files_per_year,
+                       split_bibliography)
+from src.bibstream import iter_issue_entries
+from src.catalog import Catalog
+from src.search import SearchIndex
+from src.authors import AuthorGraph
+from src.dedup import find_duplicates, iter_bibliography_records
+from src.interact import get_doi_list, iter_scopus_queries
+from src.postprocessing import _iter_issue_entries
+from src.scraper import get_publications_from_issue, make_issue_soup
+from benchmarks.synthetic import write_bibliography, write_issue_dates, issue_html, issue_era
+
+
+BASELINE_FILE = Path(__file__).parent / "baseline.json"
+# a case regresses if it is slower than baseline * REGRESSION_THRESHOLD + NOISE_FLOOR
+REGRESSION_THRESHOLD = 2.0
+# absolute slack for the very fast cases (s)
+NOISE_FLOOR = 0.01
+# issue numbers in each layout era
+ERA_ISSUES = (100, 200, 360)
+# papers per synthetic issue at scale 1
+ISSUE_PAPERS = 25
+# queries of the search case
+SEARCH_QUERIES = ("evolutionary game theory adaptive therapy", "glioblastoma", "stochastic model of tumor growth")
+
+
+def _quiet(function, *args):
+    """
+    Call function, discarding what it prints.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args)
+
+
+def get_cases(work_dir: Path, scale: int) -> dict:
+    """
+    Benchmark cases at the given scale: name -> function without arguments. The corpus is written to work_dir.
+    """
+    bib_file = work_dir / f"scale_{scale}" / "MathOncoBibliography.bib"
+    bib_file.parent.mkdir(parents=True, exist_ok=True)
+    write_bibliography(bib_file, scale)
+    issue_dates_file = bib_file.parent / "issue_dates.csv"
+    write_issue_dates(issue_dates_file, scale)
+    bib_text = bib_file.read_text()
+    entries = list(get_parsed_bibliography(bib_file).entries.values())
+    catalog = Catalog.from_bibliography(bib_file, issue_dates_file)
+    search_index = SearchIndex(bib_file.parent / "search_index")
+    search_index.update(bib_file, records_file=work_dir / "no_records.json")
+
+    cases = {
+        "get_parsed_bibliography": lambda: get_parsed_bibliography(bib_file),
+        "_iter_issue_entries": lambda: list(_iter_issue_entries(bib_text)),
+        "iter_issue_entries": lambda: list(iter_issue_entries(bib_file)),
+        "split_bib_per_issue": lambda: _quiet(split_bib_per_issue, bib_file),
+        "split_single_bib_files_per_year": lambda: split_single_bib_files_per_year(bib_file, issue_dates_file),
+        "split_bibliography": lambda: _quiet(split_bibliography, bib_file, True, True, issue_dates_file),
+        "get_bibtex_label": lambda: [get_bibtex_label(entry) for entry in entries],
+        "catalog_build": lambda: Catalog.from_bibliography(bib_file, issue_dates_file),
+        "catalog_aggregates": lambda: (catalog.n_papers_per_year(), catalog.top("journal"), catalog.top("first_author"),
+                                       catalog.count_by("journal", catalog.column("year") == 2024)),
+        "author_graph": lambda: AuthorGraph.from_bibliography(bib_file),
+        "search_query": lambda: [search_index.search(query) for query in SEARCH_QUERIES],
+        "scopus_queries": lambda: list(iter_scopus_queries(get_doi_list(bib_file))),
+        "duplicate_report": lambda: find_duplicates(list(iter_bibliography_records(bib_file))),
+    }
+    for issue_number in ERA_ISSUES:
+        html = issue_html(issue_number, n_papers=ISSUE_PAPERS * scale)
+        cases[f"get_publications_from_issue[{issue_era(issue_number)}]"] = (
+            lambda html=html, issue_number=issue_number:
+            get_publications_from_issue(make_issue_soup(html, only_relevant=True), issue_number)
+        )
+    return cases
+
+
+def run_case(function, repeat: int) -> float:
+    """
+    Best time of `repeat` runs (s).
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and compare it with the baseline")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10], help="Corpus sizes (x real corpus)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case (the best one is kept)")
+    parser.add_argument("--cases", nargs="+", default=None, help="Run only the cases with these names")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE, help="Baseline results file")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    threshold = baseline.get("threshold", REGRESSION_THRESHOLD)
+    baseline_results = baseline.get("results", {})
+
+    results = {}
+    regressions = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for scale in args.scales:
+            # fewer runs for the large corpora
+            repeat = args.repeat if scale <= 10 else 1
+            for name, function in get_cases(Path(tmp_dir), scale).items():
+                if (args.cases is not None) and (name.split("[")[0] not in args.cases):
+                    continue
+                key = f"{name}@{scale}x"
+                results[key] = run_case(function, repeat)
+
+                line = f"{key:55s} {results[key]:9.4f} s"
+                if key in baseline_results:
+                    ratio = results[key] / baseline_results[key]
+                    line += f"  baseline {baseline_results[key]:9.4f} s  ({ratio:4.2f}x)"
+                    if results[key] > baseline_results[key] * threshold + NOISE_FLOOR:
+                        line += "  REGRESSION"
+                        regressions.append(key)
+                print(line, flush=True)
+
+    if args.update_baseline:
+        baseline_results.update(results)
+        args.baseline.write_text(json.dumps({"threshold": threshold, "results": baseline_results}, indent=2) + "\n")
+        print(f"Updated {args.baseline}")
+    elif len(regressions) > 0:
+        print(f"{len(regressions)} regressions over {threshold}x the baseline: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
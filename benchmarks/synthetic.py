@@ -0,0 +1,123 @@
+"""
+Synthetic MathOnco data for the benchmarks: bibliographies scaled from the real one and issue html in each
+layout era.
+"""
+import re
+import random
+from pathlib import Path
+from src.issue_dates import FIELDS, ISSUE_DATES_FILE, load_issue_dates
+from src.utils import MATHONCO_BIB_FILE
+
+
+BANNER_URL = "https://substackcdn.com/image/fetch/w_1456/https%3A%2F%2Fbucket.s3.amazonaws.com%2Fpublic%2Fimages%2F"
+PUBLICATIONS_BANNER = "fabab95d-eefe-45a0-b47e-77fc63cde5de_1024x250.png"
+PREPRINTS_BANNER = "58c80455-f0b6-43db-830a-0f73b96ead1e_1024x250.png"
+
+WORDS = ("tumor growth model evolutionary dynamics of cancer cells under therapy mathematical analysis stochastic "
+         "resistance adaptive immune response spatial agent based simulation optimal control radiotherapy "
+         "heterogeneity metastasis inference clonal selection pharmacokinetic scheduling").split()
+
+
+def random_title(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(6, 14))
+    return " ".join(words).capitalize()
+
+
+def _paragraphs(rng: random.Random, n_papers: int, prefix: str) -> str:
+    """
+    Paragraphs with one paper link each, plus some styled links and plain text.
+    """
+    paragraphs = []
+    for i in range(n_papers):
+        paragraphs.append(
+            f'<p><a href="https://doi.org/10.5555/{prefix}.{i}">{random_title(rng)}</a> '
+            f'Doe J, Roe R, et al. <em>Journal of Synthetic Oncology</em> '
+            f'<a class="footnote-anchor" href="#footnote-{prefix}-{i}">{i}</a></p>'
+        )
+    return "\n".join(paragraphs)
+
+
+def _banner(era: str, image_name: str) -> str:
+    if era == "h3":
+        raise ValueError("The h3 era has no banners")
+    if era == "source":
+        return (f'<div class="captioned-image-container"><figure><a class="image-link image2" href="{BANNER_URL}{image_name}">'
+                f'<picture><source type="image/webp" srcset="{BANNER_URL}{image_name} 424w, {BANNER_URL}{image_name} 848w"/>'
+                f'<img class="sizing-normal" src="{BANNER_URL}{image_name}"/></picture></a></figure></div>')
+    return (f'<div class="captioned-image-container"><figure><a class="image-link image2" href="{BANNER_URL}{image_name}">'
+            f'<div class="image2-inset"><img class="sizing-normal" src="{BANNER_URL}{image_name}"/></div></a></figure></div>')
+
+
+def issue_era(issue_number: int) -> str:
+    """
+    Layout era of an issue, as in `get_publications_from_issue`.
+    """
+    if issue_number < 141:
+        return "h3"
+    if issue_number < 351:
+        return "source"
+    return "img"
+
+
+def issue_html(issue_number: int, n_papers: int = 25, seed: int = 0) -> str:
+    """
+    Html of a synthetic issue in the layout of its era: an editorial, the publications section, the preprints
+    section and some trailing content.
+    """
+    rng = random.Random(seed * 100003 + issue_number)
+    era = issue_era(issue_number)
+    intro = f"<h6><code>This week in Mathematical Oncology</code></h6>\n<p>Issue {issue_number}. " \
+            f"<a href=\"https://mathematical-oncology.org/\">mathematical-oncology.org</a></p>\n"
+    intro += _paragraphs(rng, 5, f"intro{issue_number}").replace('<a href', '<a class="news" href')
+    if era == "h3":
+        publications_header = "<h3><strong>#MathOnco Publications</strong></h3>"
+        preprints_header = "<h3><strong>#MathOnco Preprints</strong></h3>"
+    else:
+        publications_header = _banner(era, PUBLICATIONS_BANNER)
+        preprints_header = _banner(era, PREPRINTS_BANNER)
+    return "\n".join([
+        intro,
+        publications_header,
+        _paragraphs(rng, n_papers, f"pub{issue_number}"),
+        preprints_header,
+        _paragraphs(rng, n_papers // 2, f"pre{issue_number}"),
+        "<h3><strong>#Jobs</strong></h3>",
+        _paragraphs(rng, 5, f"jobs{issue_number}").replace('<a href', '<a class="job" href'),
+    ])
+
+
+def write_bibliography(out_file: Path, scale: int, bib_file: Path = MATHONCO_BIB_FILE):
+    """
+    Write a bibliography `scale` times larger than bib_file, newest issue first: each copy of the real
+    bibliography gets its issue numbers shifted after the previous copy and its entry keys suffixed, so that
+    the issues are numbered 1..N and the keys stay unique.
+    """
+    with open(bib_file, "r") as f:
+        bib_text = f.read()
+    max_issue = max(int(n) for n in re.findall(r"//MathOnco Issue (\d+)", bib_text))
+    with open(out_file, "w") as f:
+        for copy in reversed(range(scale)):
+            shift = copy * max_issue
+            copy_text = re.sub(r"//MathOnco Issue (\d+)",
+                               lambda m: f"//MathOnco Issue {int(m.group(1)) + shift}", bib_text)
+            if copy > 0:
+                copy_text = re.sub(r"^(@\w+\{)([^,\s]+),", rf"\g<1>\g<2>x{copy},", copy_text, flags=re.MULTILINE)
+            f.write(copy_text)
+
+
+def write_issue_dates(out_file: Path, scale: int, bib_file: Path = MATHONCO_BIB_FILE,
+                      index_file: Path = ISSUE_DATES_FILE):
+    """
+    Write the issue dates index of the bibliography written by `write_bibliography`: each shifted issue has
+    the year of the real issue it copies.
+    """
+    with open(bib_file, "r") as f:
+        max_issue = max(int(n) for n in re.findall(r"//MathOnco Issue (\d+)", f.read()))
+    issue_dates = load_issue_dates(index_file)
+    lines = [",".join(FIELDS)]
+    for copy in range(scale):
+        for issue_number in range(1, max_issue + 1):
+            year, date = issue_dates[issue_number]
+            lines.append(f"{issue_number + copy * max_issue},{year},{date or ''}")
+    with open(out_file, "w") as f:
+        f.write("\n".join(lines) + "\n")
@@ -0,0 +1,209 @@
+"""
+Author statistics and co-authorship graph of the bibliography.
+
+Authors are identified by their normalized surname and first initial (same `unidecode` handling as the labels),
+and the bibliography becomes a sparse author x paper incidence matrix, stored as coordinate (COO) arrays. The
+co-authorship matrix B Bᵀ is computed block by block (one block per paper) with NumPy, giving the degree of
+each author; connected components are found by min-label propagation with pointer jumping. Results are cached
+in `out/authors.npz` and recomputed when the bibliography changes.
+
+    python -m src.authors --top 10
+"""
+import logging
+import argparse
+from pathlib import Path
+import numpy as np
+from src.bibstream import iter_issue_entries, parse_fields
+from src.utils import MATHONCO_BIB_FILE, normalize_surname
+
+
+AUTHORS_FILE = Path("out/authors.npz")
+
+
+def split_name(name: str) -> tuple:
+    """
+    (last, first) names of a BibTeX name, written as "Last, First" or "First Last".
+    """
+    name = name.replace("{", "").replace("}", "").strip()
+    if "," in name:
+        last, first = name.split(",", 1)
+    else:
+        *first, last = name.split(" ")
+        first = " ".join(first)
+    return last.strip(), first.strip()
+
+
+def author_key(name: str) -> str:
+    """
+    Key identifying an author: normalized surname and first initial, e.g. "west j".
+    """
+    last, first = split_name(name)
+    initial = normalize_surname(first[:1])
+    return f"{normalize_surname(last)} {initial}".strip()
+
+
+def _coauthor_pairs(authors: np.ndarray, papers: np.ndarray) -> tuple:
+    """
+    Nonzero entries (a, b, joint papers) of B Bᵀ outside the diagonal, for the incidence matrix B given as
+    COO arrays sorted by paper.
+    """
+    paper_sizes = np.bincount(papers)
+    paper_starts = np.cumsum(paper_sizes) - paper_sizes
+    # pair each entry with all the entries of its paper
+    entry_sizes = paper_sizes[papers]
+    left = np.repeat(np.arange(len(authors)), entry_sizes)
+    position = np.arange(len(left)) - np.repeat(np.cumsum(entry_sizes) - entry_sizes, entry_sizes)
+    right = paper_starts[papers[left]] + position
+    a, b = authors[left], authors[right]
+    off_diagonal = a != b
+    n_authors = authors.max() + 1 if len(authors) > 0 else 0
+    pair_codes, joint_papers = np.unique(a[off_diagonal].astype(np.int64) * n_authors + b[off_diagonal],
+                                         return_counts=True)
+    return pair_codes // n_authors, pair_codes % n_authors, joint_papers
+
+
+def _components(n_nodes: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Component label (smallest node of the component) of each node, for the symmetric edges (a, b).
+    """
+    labels = np.arange(n_nodes)
+    while True:
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, a, labels[b])
+        # pointer jumping
+        new_labels = new_labels[new_labels]
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
+
+
+class AuthorGraph:
+    """
+    Author x paper incidence (COO arrays) with the derived author statistics.
+    """
+
+    def __init__(self, arrays: dict):
+        self.arrays = arrays
+        self.keys = arrays["author_keys"]
+        self.names = arrays["author_names"]
+
+    @classmethod
+    def from_bibliography(cls, bib_file: Path = MATHONCO_BIB_FILE) -> "AuthorGraph":
+        """
+        Build the incidence matrix with a single pass over the bibliography, and compute the statistics.
+        """
+        author_ids, names = {}, []
+        incidence_authors, incidence_papers, paper_issues = [], [], []
+        for paper_id, (issue_number, raw_entry) in enumerate(iter_issue_entries(bib_file)):
+            paper_issues.append(issue_number)
+            author_field = parse_fields(raw_entry).get("author")
+            paper_authors = set()
+            for name in (author_field.split(" and ") if author_field else []):
+                key = author_key(name)
+                if (key == "") or (key == "others") or (key in paper_authors):
+                    continue
+                paper_authors.add(key)
+                if key not in author_ids:
+                    author_ids[key] = len(author_ids)
+                    names.append(" ".join(reversed(split_name(name))).strip())
+                incidence_authors.append(author_ids[key])
+                incidence_papers.append(paper_id)
+
+        authors = np.array(incidence_authors, dtype=np.int32)
+        papers = np.array(incidence_papers, dtype=np.int32)
+        issues = np.array(paper_issues, dtype=np.int32)
+        n_authors = len(author_ids)
+
+        a, b, joint_papers = _coauthor_pairs(authors, papers)
+        # distinct (issue, author) pairs
+        issue_author_codes = np.unique(issues[papers].astype(np.int64) * max(n_authors, 1) + authors)
+        featured_issues = issue_author_codes // max(n_authors, 1)
+        arrays = {
+            "author_keys": np.array(list(author_ids), dtype=str),
+            "author_names": np.array(names, dtype=str),
+            "incidence_authors": authors,
+            "incidence_papers": papers,
+            "paper_issues": issues,
+            "papers_per_author": np.bincount(authors, minlength=n_authors),
+            "issues_per_author": np.bincount(issue_author_codes % max(n_authors, 1), minlength=n_authors),
+            "degree": np.bincount(a, minlength=n_authors),
+            "collaborations": np.bincount(a, weights=joint_papers, minlength=n_authors).astype(np.int64),
+            "component": _components(n_authors, a, b),
+            "authors_per_issue": np.bincount(featured_issues, minlength=issues.max() + 1 if len(issues) else 0),
+        }
+        return cls(arrays)
+
+    @classmethod
+    def load(cls, authors_file: Path = AUTHORS_FILE) -> "AuthorGraph":
+        with np.load(authors_file, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def save(self, authors_file: Path = AUTHORS_FILE):
+        authors_file = Path(authors_file)
+        authors_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(authors_file, "wb") as f:
+            np.savez(f, **self.arrays)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def top(self, statistic: str, n: int = 10) -> list:
+        """
+        The `n` authors with the highest value of the statistic (e.g. "papers_per_author", "degree"), as
+        (name, value) pairs.
+        """
+        values = self.arrays[statistic]
+        order = np.argsort(-values, kind="stable")[:n]
+        return [(self.names[i].item(), int(values[i])) for i in order]
+
+    def component_sizes(self) -> np.ndarray:
+        """
+        Sizes of the connected components of the co-authorship graph, largest first.
+        """
+        sizes = np.bincount(self.arrays["component"])
+        return np.sort(sizes[sizes > 0])[::-1]
+
+    def authors_per_issue(self) -> tuple:
+        """
+        (issue numbers, distinct authors featured in each issue).
+        """
+        counts = self.arrays["authors_per_issue"]
+        issues = np.flatnonzero(counts)
+        return issues, counts[issues]
+
+
+def get_author_graph(bib_file: Path = MATHONCO_BIB_FILE, authors_file: Path = AUTHORS_FILE) -> AuthorGraph:
+    """
+    Load the cached author statistics, recomputing them if the bibliography is newer.
+    """
+    authors_file = Path(authors_file)
+    if authors_file.exists() and (authors_file.stat().st_mtime >= Path(bib_file).stat().st_mtime):
+        return AuthorGraph.load(authors_file)
+
+    graph = AuthorGraph.from_bibliography(bib_file)
+    graph.save(authors_file)
+    logging.info(f"Computed the statistics of {len(graph)} authors in {authors_file}")
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Author statistics of the MathOnco bibliography")
+    parser.add_argument("--top", type=int, default=10, help="Number of authors to show")
+    args = parser.parse_args()
+
+    graph = get_author_graph()
+    for title, statistic in [("Most featured authors (papers)", "papers_per_author"),
+                             ("Authors featured in most issues", "issues_per_author"),
+                             ("Most connected authors (co-authors)", "degree")]:
+        print(f"{title}:")
+        for name, value in graph.top(statistic, args.top):
+            print(f"{value:6d}  {name}")
+        print()
+    sizes = graph.component_sizes()
+    print(f"{len(graph)} authors in {len(sizes)} co-authorship components (largest: {sizes[:5].tolist()})")
+    issues, counts = graph.authors_per_issue()
+    print(f"Authors per issue: mean {counts.mean():.1f}, max {counts.max()} (issue {issues[np.argmax(counts)]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Streaming splitter for the MathOnco bibliography.
+
+The bibliography is memory-mapped and scanned with compiled patterns: issue markers and entry headers are
+found with `re.search`, and the end of each entry is found by jumping from brace to brace, skipping quoted
+values without braces in a single step. Entries are yielded lazily, so memory does not grow with the file.
+The header and the fields of a raw entry are read with `parse_header` and `parse_fields`, relying on the
+one-field-per-line format written by pybtex.
+"""
+import re
+import mmap
+import logging
+from pathlib import Path
+
+
+# patterns for the bytes of a memory-mapped file: issue marker, entry header, braces and quoted values
+BYTES_PATTERNS = (
+    re.compile(rb"//MathOnco Issue\s+(\d+)\s*\n"),
+    re.compile(rb"@\w+\s*{"),
+    re.compile(rb'"[^"{}]*"|[{}]'),
+    b"{",
+)
+
+# same patterns for text
+TEXT_PATTERNS = (
+    re.compile(r"//MathOnco Issue\s+(\d+)\s*\n"),
+    re.compile(r"@\w+\s*{"),
+    re.compile(r'"[^"{}]*"|[{}]'),
+    "{",
+)
+
+# entry header (type and key) and `name = "value"` field lines of a raw entry
+HEADER_PATTERN = re.compile(r"@(\w+)\s*{\s*([^,\s]+)\s*,")
+FIELD_PATTERN = re.compile(r'^\s*(\w+)\s*=\s*"(.*)",?\s*$', re.MULTILINE)
+
+
+def _find_entry_end(buffer, start: int, end: int, brace_pattern, open_brace) -> int:
+    """
+    Position after the brace closing the entry starting at `start`, or None if the entry is not closed before `end`.
+    """
+    brace_level = 0
+    for token in brace_pattern.finditer(buffer, start, end):
+        brace = token.group()
+        # skip quoted values without braces
+        if len(brace) > 1:
+            continue
+        if brace == open_brace:
+            brace_level += 1
+        else:
+            brace_level -= 1
+            if brace_level == 0:
+                return token.end()
+    return None
+
+
+def iter_issue_spans(buffer):
+    """
+    Yield (issue_number, start, end) for each issue of the buffer (str or bytes-like), in file order. The issue
+    goes from its marker to the following one.
+    """
+    issue_pattern = TEXT_PATTERNS[0] if isinstance(buffer, str) else BYTES_PATTERNS[0]
+    issue_match = issue_pattern.search(buffer)
+    while issue_match is not None:
+        next_issue_match = issue_pattern.search(buffer, issue_match.end())
+        issue_end = next_issue_match.start() if next_issue_match is not None else len(buffer)
+        yield int(issue_match.group(1)), issue_match.start(), issue_end
+        issue_match = next_issue_match
+
+
+def _scan_issue_entries(buffer, patterns):
+    """
+    Yield (issue_number, start, end) for each entry of the buffer (str or bytes-like), in file order.
+    """
+    _, entry_pattern, brace_pattern, open_brace = patterns
+
+    for issue_number, position, block_end in iter_issue_spans(buffer):
+        while True:
+            entry_match = entry_pattern.search(buffer, position, block_end)
+            if entry_match is None:
+                break
+            entry_end = _find_entry_end(buffer, entry_match.start(), block_end, brace_pattern, open_brace)
+            if entry_end is None:
+                logging.warning(f"Could not parse one entry in issue {issue_number}.")
+            else:
+                yield issue_number, entry_match.start(), entry_end
+            position = entry_match.end()
+
+
+def iter_issue_entries_from_text(bib_text: str):
+    """
+    Yield (issue_number, raw_entry) for each BibTeX entry of the text, in file order.
+    """
+    for issue_number, start, end in _scan_issue_entries(bib_text, TEXT_PATTERNS):
+        yield issue_number, bib_text[start:end]
+
+
+def iter_issue_entries(bib_file: Path):
+    """
+    Yield (issue_number, raw_entry) for each BibTeX entry of the file, in file order, reading it through
+    a memory map.
+    """
+    with open(bib_file, "rb") as f:
+        # empty files cannot be mapped
+        if f.seek(0, 2) == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for issue_number, start, end in _scan_issue_entries(buffer, BYTES_PATTERNS):
+                yield issue_number, buffer[start:end].decode("utf-8")
+
+
+def parse_header(raw_entry: str) -> tuple:
+    """
+    (entry type in lowercase, entry key) of a raw BibTeX entry.
+    """
+    match = HEADER_PATTERN.match(raw_entry)
+    return match.group(1).lower(), match.group(2)
+
+
+def parse_fields(raw_entry: str) -> dict:
+    """
+    Fields of a raw BibTeX entry as {lowercase name: value}, values as written (braces included).
+    """
+    return {name.lower(): value for name, value in FIELD_PATTERN.findall(raw_entry)}
@@ -0,0 +1,162 @@
+"""
+Persistent on-disk cache for the responses of Crossref, content negotiation and OpenAlex.
+
+Responses are stored in a SQLite database, keyed by source and normalized request. Each source has its
+own time-to-live; failed lookups (e.g. titles without DOI) are stored as negative results and retried
+following a backoff schedule. When the database grows above the size cap, the least recently used
+entries are evicted.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+
+DAY = 24 * 60 * 60
+
+# default cache location (set MATHONCO_CACHE=off to disable the cache)
+CACHE_FILE = os.environ.get("MATHONCO_CACHE", "cache/responses.sqlite")
+
+# time-to-live of positive results for each source
+DEFAULT_TTLS = {
+    "crossref": 180 * DAY,  # title -> DOI
+    "content_negotiation": 365 * DAY,  # DOI -> formatted citation
+    "openalex": 90 * DAY,  # DOI -> abstract
+}
+
+# time before retrying a negative result, depending on the number of failures so far
+NEGATIVE_BACKOFF = [7 * DAY, 28 * DAY, 91 * DAY, 182 * DAY]
+
+# maximum size of the stored values
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def normalize_request(request: str) -> str:
+    """
+    Normalize a request (title, DOI, ...) so that trivially different requests share the same key.
+    """
+    return " ".join(str(request).lower().split())
+
+
+class ResponseCache:
+    """
+    SQLite-backed response cache with per-source TTLs, LRU eviction and negative-result backoff.
+    """
+
+    def __init__(self, path: str = CACHE_FILE, ttls: dict = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 negative_backoff: list = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttls = dict(DEFAULT_TTLS) if ttls is None else ttls
+        self.max_bytes = max_bytes
+        self.negative_backoff = NEGATIVE_BACKOFF if negative_backoff is None else negative_backoff
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                source TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT,
+                size INTEGER NOT NULL,
+                failures INTEGER NOT NULL DEFAULT 0,
+                expires REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (source, key)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS last_access_idx ON responses (last_access)")
+        self.connection.commit()
+        self.total_size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, source: str, request: str):
+        """
+        Look up a request. Return (True, value) on a hit, where value is None for a negative result,
+        and (False, None) on a miss or when the stored entry is expired.
+        """
+        key = normalize_request(request)
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value, expires FROM responses WHERE source = ? AND key = ?", (source, key)
+            ).fetchone()
+            if (row is None) or (row[1] < now):
+                self.misses += 1
+                return False, None
+            self.connection.execute(
+                "UPDATE responses SET last_access = ? WHERE source = ? AND key = ?", (now, source, key)
+            )
+            self.connection.commit()
+            self.hits += 1
+        value = None if row[0] is None else json.loads(row[0])
+        return True, value
+
+    def set(self, source: str, request: str, value):
+        """
+        Store the response to a request. A value of None is stored as a negative result, expiring
+        according to the backoff schedule.
+        """
+        key = normalize_request(request)
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT size, failures, value IS NULL FROM responses WHERE source = ? AND key = ?", (source, key)
+            ).fetchone()
+            old_size = 0 if row is None else row[0]
+            if value is None:
+                # negative result: the more it failed, the longer we wait before retrying
+                failures = row[1] if (row is not None and row[2]) else 0
+                backoff = self.negative_backoff[min(failures, len(self.negative_backoff) - 1)]
+                serialized, size, failures, expires = None, len(key), failures + 1, now + backoff
+            else:
+                serialized = json.dumps(value)
+                size, failures, expires = len(key) + len(serialized), 0, now + self.ttls.get(source, 30 * DAY)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (source, key, value, size, failures, expires, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (source, key, serialized, size, failures, expires, now)
+            )
+            self.total_size += size - old_size
+            if self.total_size > self.max_bytes:
+                self._evict()
+            self.connection.commit()
+
+    def _evict(self):
+        """
+        Delete the least recently used entries until the cache is below the size cap.
+        """
+        to_free = self.total_size - self.max_bytes
+        evicted = []
+        for source, key, size in self.connection.execute(
+                "SELECT source, key, size FROM responses ORDER BY last_access ASC"):
+            if to_free <= 0:
+                break
+            evicted.append((source, key))
+            to_free -= size
+            self.total_size -= size
+        self.connection.executemany("DELETE FROM responses WHERE source = ? AND key = ?", evicted)
+
+    def close(self):
+        self.connection.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> ResponseCache:
+    """
+    Get the cache shared by the whole process, or None if the cache is disabled.
+    """
+    global _default_cache
+    if CACHE_FILE.lower() in ("", "0", "off", "none"):
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(CACHE_FILE)
+        return _default_cache
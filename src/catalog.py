@@ -0,0 +1,181 @@
+"""
+Columnar catalog of the bibliography, for statistics without re-reading the BibTeX.
+
+The catalog has one row per entry and the columns issue, year (of the issue), entry type, journal, DOI,
+publication year, number of authors and first author. Text columns are dictionary-encoded (integer codes
+plus the array of distinct values), so aggregates are `np.bincount` calls. The catalog is stored as a NumPy
+`.npz` file and rebuilt when the bibliography or the issue dates index change.
+
+    python -m src.catalog --top 10
+"""
+import logging
+import argparse
+from pathlib import Path
+import numpy as np
+from src.bibstream import iter_issue_entries, parse_fields, parse_header
+from src.issue_dates import ISSUE_DATES_FILE, get_issue_year_lookup
+from src.utils import MATHONCO_BIB_FILE
+
+
+CATALOG_FILE = Path("out/catalog.npz")
+
+NUMERIC_COLUMNS = ("issue", "year", "publication_year", "n_authors")
+TEXT_COLUMNS = ("entry_type", "journal", "doi", "first_author")
+
+
+def _clean(value: str) -> str:
+    return value.replace("{", "").replace("}", "").strip()
+
+
+def parse_entry(raw_entry: str) -> dict:
+    """
+    Catalog fields of a raw BibTeX entry, relying on the one-field-per-line format written by pybtex.
+    """
+    fields = parse_fields(raw_entry)
+    authors = [author for author in _clean(fields.get("author", "")).split(" and ") if author]
+    publication_year = fields.get("year", "")
+    return {
+        "entry_type": parse_header(raw_entry)[0],
+        "journal": _clean(fields.get("journal", fields.get("booktitle", ""))),
+        "doi": fields.get("doi", "").strip().lower(),
+        "publication_year": int(publication_year) if publication_year.isdigit() else 0,
+        "n_authors": len(authors),
+        "first_author": authors[0].strip() if authors else "",
+    }
+
+
+def _encode(values: list) -> tuple:
+    """
+    Dictionary-encode a list of strings: (codes, distinct values).
+    """
+    categories, codes = np.unique(np.array(values, dtype=str), return_inverse=True)
+    return codes.astype(np.int32), categories
+
+
+class Catalog:
+    """
+    Column arrays of the bibliography. Text columns are stored as `<name>_codes` and `<name>_values`.
+    """
+
+    def __init__(self, arrays: dict):
+        self.arrays = arrays
+
+    def __len__(self) -> int:
+        return len(self.arrays["issue"])
+
+    @classmethod
+    def from_bibliography(cls, bib_file: Path = MATHONCO_BIB_FILE,
+                          issue_dates_file: Path = ISSUE_DATES_FILE) -> "Catalog":
+        """
+        Build the catalog with a single streaming pass over the bibliography.
+        """
+        issue_year = get_issue_year_lookup(issue_dates_file)
+
+        columns = {name: [] for name in NUMERIC_COLUMNS + TEXT_COLUMNS}
+        for issue_number, raw_entry in iter_issue_entries(bib_file):
+            entry = parse_entry(raw_entry)
+            entry["issue"] = issue_number
+            entry["year"] = issue_year(issue_number)
+            for name, column in columns.items():
+                column.append(entry[name])
+
+        arrays = {
+            "issue": np.array(columns["issue"], dtype=np.int32),
+            "year": np.array(columns["year"], dtype=np.int16),
+            "publication_year": np.array(columns["publication_year"], dtype=np.int16),
+            "n_authors": np.array(columns["n_authors"], dtype=np.int16),
+        }
+        for name in TEXT_COLUMNS:
+            arrays[f"{name}_codes"], arrays[f"{name}_values"] = _encode(columns[name])
+        return cls(arrays)
+
+    @classmethod
+    def load(cls, catalog_file: Path = CATALOG_FILE) -> "Catalog":
+        with np.load(catalog_file, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def save(self, catalog_file: Path = CATALOG_FILE):
+        catalog_file = Path(catalog_file)
+        catalog_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(catalog_file, "wb") as f:
+            np.savez(f, **self.arrays)
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Values of a column (decoded, for text columns).
+        """
+        if name in self.arrays:
+            return self.arrays[name]
+        return self.arrays[f"{name}_values"][self.arrays[f"{name}_codes"]]
+
+    def count_by(self, name: str, mask: np.ndarray = None) -> tuple:
+        """
+        Number of entries for each value of the column, optionally only for the entries in `mask`.
+        Return (values, counts), sorted by value.
+        """
+        if f"{name}_codes" in self.arrays:
+            codes = self.arrays[f"{name}_codes"] if mask is None else self.arrays[f"{name}_codes"][mask]
+            counts = np.bincount(codes, minlength=len(self.arrays[f"{name}_values"]))
+            present = counts > 0
+            return self.arrays[f"{name}_values"][present], counts[present]
+        values = self.arrays[name] if mask is None else self.arrays[name][mask]
+        return np.unique(values, return_counts=True)
+
+    def top(self, name: str, n: int = 10, mask: np.ndarray = None, skip_empty: bool = True) -> list:
+        """
+        The `n` most frequent values of the column, as (value, count) pairs.
+        """
+        values, counts = self.count_by(name, mask)
+        if skip_empty and (values.dtype.kind == "U"):
+            values, counts = values[values != ""], counts[values != ""]
+        order = np.argsort(-counts, kind="stable")[:n]
+        return [(values[i].item(), int(counts[i])) for i in order]
+
+    def n_papers_per_year(self) -> "pandas.DataFrame":
+        """
+        Number of entries featured in the issues of each year.
+        """
+        import pandas as pd
+        years, counts = self.count_by("year")
+        return pd.DataFrame({"Year": years, "n_papers": counts})
+
+
+def get_catalog(bib_file: Path = MATHONCO_BIB_FILE, catalog_file: Path = CATALOG_FILE,
+                issue_dates_file: Path = ISSUE_DATES_FILE) -> Catalog:
+    """
+    Load the stored catalog, rebuilding it if the bibliography or the issue dates are newer.
+    """
+    bib_file = Path(bib_file)
+    catalog_file = Path(catalog_file)
+    sources_mtime = max(Path(path).stat().st_mtime for path in (bib_file, issue_dates_file))
+    if catalog_file.exists() and (catalog_file.stat().st_mtime >= sources_mtime):
+        return Catalog.load(catalog_file)
+
+    catalog = Catalog.from_bibliography(bib_file, issue_dates_file)
+    catalog.save(catalog_file)
+    logging.info(f"Built catalog of {len(catalog)} entries in {catalog_file}")
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Statistics of the MathOnco bibliography")
+    parser.add_argument("--top", type=int, default=10, help="Number of journals and authors to show")
+    parser.add_argument("--year", type=int, default=None, help="Only count the issues of this year")
+    args = parser.parse_args()
+
+    catalog = get_catalog()
+    mask = None if args.year is None else catalog.column("year") == args.year
+    print(catalog.n_papers_per_year().to_string(index=False))
+    print("\nEntry types:")
+    for value, count in catalog.top("entry_type", mask=mask):
+        print(f"{count:6d}  {value}")
+    print("\nJournals:")
+    for value, count in catalog.top("journal", args.top, mask):
+        print(f"{count:6d}  {value}")
+    print("\nFirst authors:")
+    for value, count in catalog.top("first_author", args.top, mask):
+        print(f"{count:6d}  {value}")
+
+
+if __name__ == "__main__":
+    main()
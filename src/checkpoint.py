@@ -0,0 +1,133 @@
+"""
+Per-issue checkpoint journal for the scraper.
+
+Each processed issue is appended to a JSON Lines journal as soon as it is done, with a single write followed
+by fsync, so a crash loses at most the issue in progress (a torn last line is ignored). On restart, the
+completed issue numbers are read from the beginning of each line, without decoding the papers. Compaction
+produces the sorted `issues.json` and gives the journal the same modification time, so an `issues.json` changed
+afterwards (e.g. by `remove_duplicates` or by hand) is newer than the journal and replaces it on the next run.
+"""
+import os
+import re
+import json
+import logging
+from pathlib import Path
+from src.storage import atomic_write
+from src.metrics import get_default_metrics
+
+
+ISSUES_JOURNAL = Path("out/issues.journal.jsonl")
+
+LINE_PATTERN = re.compile(r'\{"issue": (\d+), ')
+EMPTY_LINE_END = '"papers": []}\n'
+
+
+def repair_journal(journal_file: Path = ISSUES_JOURNAL):
+    """
+    Drop the torn last line left by an interrupted write, so that new checkpoints start on a new line.
+    """
+    journal_file = Path(journal_file)
+    if not journal_file.exists():
+        return
+    with open(journal_file, "rb+") as f:
+        content_end = f.seek(0, 2)
+        if content_end == 0:
+            return
+        f.seek(content_end - 1)
+        if f.read(1) == b"\n":
+            return
+        # find the end of the last complete line
+        position = content_end
+        while position > 0:
+            block_start = max(0, position - 4096)
+            f.seek(block_start)
+            block = f.read(position - block_start)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                f.truncate(block_start + newline + 1)
+                break
+            position = block_start
+        else:
+            f.truncate(0)
+    logging.warning(f"Removed an incomplete checkpoint from {journal_file}")
+
+
+def append_checkpoint(issue_number: int, papers: list, journal_file: Path = ISSUES_JOURNAL):
+    """
+    Append the papers of a completed issue to the journal.
+    """
+    journal_file = Path(journal_file)
+    journal_file.parent.mkdir(parents=True, exist_ok=True)
+    line = json.dumps({"issue": int(issue_number), "papers": papers}) + "\n"
+    with open(journal_file, "a") as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+    get_default_metrics().count("bytes_written", len(line.encode()))
+
+
+def _iter_complete_lines(journal_file: Path):
+    """
+    Yield the lines of the journal, skipping a torn line left by an interrupted write.
+    """
+    with open(journal_file, "r") as f:
+        for line in f:
+            if line.endswith("\n"):
+                yield line
+
+
+def completed_issues(journal_file: Path = ISSUES_JOURNAL) -> set:
+    """
+    Issue numbers already in the journal, with at least one paper (issues without papers are retried).
+    """
+    journal_file = Path(journal_file)
+    if not journal_file.exists():
+        return set()
+    lines = (line for line in _iter_complete_lines(journal_file) if not line.endswith(EMPTY_LINE_END))
+    return {int(match.group(1)) for match in map(LINE_PATTERN.match, lines) if match}
+
+
+def seed_journal(out_json_file: Path, journal_file: Path = ISSUES_JOURNAL):
+    """
+    Create the journal from an existing issues.json, if there is no journal (issues.json written before the
+    journal was introduced) or if issues.json was changed after the last compaction.
+    """
+    journal_file = Path(journal_file)
+    out_json_file = Path(out_json_file)
+    if not out_json_file.exists():
+        return
+    if journal_file.exists():
+        if out_json_file.stat().st_mtime_ns <= journal_file.stat().st_mtime_ns:
+            return
+        logging.warning(f"{out_json_file} changed after the last compaction, replacing journal {journal_file}")
+    with open(out_json_file, "r") as infile:
+        output_dict = json.load(infile)
+    lines = [json.dumps({"issue": int(issue_number), "papers": papers}) + "\n"
+             for issue_number, papers in sorted(output_dict.items(), key=lambda t: int(t[0]))]
+    atomic_write(journal_file, "".join(lines))
+    logging.info(f"Created journal {journal_file} with {len(lines)} issues from {out_json_file}")
+
+
+def compact(out_json_file: Path, journal_file: Path = ISSUES_JOURNAL) -> dict:
+    """
+    Write the issues of the journal to out_json_file, sorted by issue number (newest first) as done by the
+    scraper. Issues without papers are left out; if an issue is in the journal more than once, the last
+    occurrence is kept.
+    """
+    output_dict = {}
+    if Path(journal_file).exists():
+        for line in _iter_complete_lines(journal_file):
+            checkpoint = json.loads(line)
+            output_dict[checkpoint["issue"]] = checkpoint["papers"]
+
+    # sort output dict
+    sorted_dict = {str(issue_number): papers
+                   for issue_number, papers in sorted(output_dict.items(), reverse=True) if len(papers) > 0}
+
+    # write
+    atomic_write(out_json_file, json.dumps(sorted_dict, indent=2))
+
+    # same modification time for the journal, so that later changes of out_json_file are detected
+    if Path(journal_file).exists():
+        os.utime(journal_file, ns=(os.stat(journal_file).st_atime_ns, os.stat(out_json_file).st_mtime_ns))
+    return sorted_dict
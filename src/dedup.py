@@ -0,0 +1,242 @@
+"""
+Duplicate detection for `issues.json` and for the bibliography.
+
+Records are grouped by normalized DOI with a hash index, and by normalized title. Near-duplicate titles are
+found with MinHash signatures of the title q-grams and locality-sensitive hashing (banding); candidate pairs
+are verified with the same SequenceMatcher threshold used for Crossref results. Title matches are only used
+when at least one of the two records has no DOI. Everything is linear in the number of records, except the
+verification of the (few) candidate pairs.
+
+    python -m src.dedup --issues out/issues.json
+    python -m src.dedup --bib res/MathOncoBibliography.bib
+"""
+import re
+import json
+import logging
+import argparse
+from pathlib import Path
+from difflib import SequenceMatcher
+import numpy as np
+from unidecode import unidecode
+from src.bibstream import iter_issue_entries, parse_fields, parse_header
+from src.matching import MIN_JACCARD, MIN_LENGTH_RATIO, SIMILARITY_THRESHOLD, format_title, qgram_hashes
+from src.utils import MATHONCO_BIB_FILE
+
+
+DUPLICATES_FILE = Path("out/duplicates.json")
+
+# MinHash signature: BANDS bands of ROWS hashes (candidates above a Jaccard similarity of about 0.6)
+BANDS = 20
+ROWS = 6
+# titles hashed at once
+SIGNATURE_CHUNK = 512
+# prime modulus of the hash functions (2**31 - 1)
+PRIME = 2147483647
+
+DOI_PREFIX_PATTERN = re.compile(r"^(https?://(dx\.)?doi\.org/|doi:\s*)", re.IGNORECASE)
+
+
+def normalize_doi(doi: str) -> str:
+    """
+    Lowercase DOI without resolver prefix, or None.
+    """
+    if doi is None:
+        return None
+    doi = DOI_PREFIX_PATTERN.sub("", doi.strip()).strip().lower()
+    return doi if doi != "" else None
+
+
+def normalize_title(title: str) -> str:
+    """
+    Lowercase ASCII title with single spaces between words, without braces and punctuation.
+    """
+    return " ".join(re.findall(r"[a-z0-9]+", unidecode(title or "").lower()))
+
+
+def iter_issues_records(issues_dict: dict):
+    """
+    Yield the records (issue, index in the issue, title, DOI) of the issues dict {issue: [papers]}.
+    """
+    for issue, papers in issues_dict.items():
+        for index, paper in enumerate(papers):
+            yield {"issue": int(issue), "index": index, "title": paper.get("title"), "doi": paper.get("DOI")}
+
+
+def iter_issues_json_records(issues_file: Path):
+    """
+    Yield the records of an issues.json file.
+    """
+    with open(issues_file, "r") as f:
+        yield from iter_issues_records(json.load(f))
+
+
+def iter_bibliography_records(bib_file: Path = MATHONCO_BIB_FILE):
+    """
+    Yield the records (issue, entry key, title, DOI) of the bibliography.
+    """
+    for issue_number, raw_entry in iter_issue_entries(bib_file):
+        fields = parse_fields(raw_entry)
+        yield {"issue": issue_number, "key": parse_header(raw_entry)[1],
+               "title": fields.get("title", "").replace("{", "").replace("}", ""), "doi": fields.get("doi")}
+
+
+def minhash_signatures(titles: list, seed: int = 0) -> np.ndarray:
+    """
+    MinHash signatures (one row per title, BANDS * ROWS columns) of the q-gram sets of the titles.
+    """
+    rng = np.random.default_rng(seed)
+    n_hashes = BANDS * ROWS
+    a = rng.integers(1, PRIME, size=(n_hashes, 1), dtype=np.int64)
+    b = rng.integers(0, PRIME, size=(n_hashes, 1), dtype=np.int64)
+    signatures = np.empty((len(titles), n_hashes), dtype=np.int64)
+    for chunk_start in range(0, len(titles), SIGNATURE_CHUNK):
+        grams = [qgram_hashes(title) for title in titles[chunk_start:chunk_start + SIGNATURE_CHUNK]]
+        sizes = np.array([len(g) for g in grams])
+        starts = np.cumsum(sizes) - sizes
+        # (a * x + b) mod p for all q-grams of the chunk, then minimum over the q-grams of each title
+        hashes = (a * (np.concatenate(grams) % PRIME) + b) % PRIME
+        signatures[chunk_start:chunk_start + len(grams)] = np.minimum.reduceat(hashes, starts, axis=1).T
+    return signatures
+
+
+def near_duplicate_pairs(titles: list) -> list:
+    """
+    Pairs (i, j) of titles whose similarity is above the threshold, found through LSH on MinHash signatures.
+    """
+    signatures = minhash_signatures(titles)
+    candidates = set()
+    for band in range(BANDS):
+        buckets = {}
+        for i, band_signature in enumerate(map(bytes, signatures[:, band * ROWS:(band + 1) * ROWS])):
+            buckets.setdefault(band_signature, []).append(i)
+        for bucket in buckets.values():
+            for position, i in enumerate(bucket):
+                candidates.update((i, j) for j in bucket[position + 1:])
+
+    if len(candidates) == 0:
+        return []
+    # discard candidates whose estimated Jaccard similarity or length ratio is too low before verifying them
+    first, second = np.array(sorted(candidates)).T
+    estimated_jaccard = (signatures[first] == signatures[second]).mean(axis=1)
+    lengths = np.array([len(title) for title in titles])
+    length_ratio = np.minimum(lengths[first], lengths[second]) / np.maximum(lengths[first], lengths[second])
+    keep = (estimated_jaccard >= MIN_JACCARD) & (length_ratio >= MIN_LENGTH_RATIO)
+
+    pairs = []
+    for i, j in zip(first[keep].tolist(), second[keep].tolist()):
+        if SequenceMatcher(None, titles[i], titles[j]).ratio() > SIMILARITY_THRESHOLD:
+            pairs.append((i, j))
+    return pairs
+
+
+def _find(parents: list, i: int) -> int:
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def _union(parents: list, root_dois: dict, i: int, j: int) -> bool:
+    """
+    Merge the groups of i and j, unless they have different DOIs. Return whether i and j are in the same group.
+    """
+    root_i, root_j = _find(parents, i), _find(parents, j)
+    if root_i == root_j:
+        return True
+    doi_i, doi_j = root_dois.get(root_i), root_dois.get(root_j)
+    # records with different DOIs are different papers (e.g. preprint and article)
+    if (doi_i is not None) and (doi_j is not None) and (doi_i != doi_j):
+        return False
+    root = min(root_i, root_j)
+    parents[max(root_i, root_j)] = root
+    root_dois[root] = doi_i if doi_i is not None else doi_j
+    return True
+
+
+def find_duplicates(records: list) -> list:
+    """
+    Groups of duplicated records, as lists of record indices in input order. Each group also says whether it was
+    found through the DOI, the title or both: [{"match": "doi" | "title" | "doi+title", "records": [...]}].
+    """
+    parents = list(range(len(records)))
+    dois = [normalize_doi(record["doi"]) for record in records]
+    # DOI of each group (by root), a group never gets two different DOIs
+    root_dois = {i: doi for i, doi in enumerate(dois) if doi is not None}
+    matched_by = {}
+
+    # same normalized DOI
+    first_with_doi = {}
+    for i, doi in enumerate(dois):
+        if doi is not None:
+            first = first_with_doi.setdefault(doi, i)
+            if first != i:
+                _union(parents, root_dois, first, i)
+                matched_by.setdefault(first, set()).add("doi")
+                matched_by.setdefault(i, set()).add("doi")
+
+    # same normalized title, then near-duplicate titles among the distinct ones
+    title_records = {}
+    for i, record in enumerate(records):
+        title = normalize_title(record["title"])
+        if title != "":
+            title_records.setdefault(title, []).append(i)
+    distinct_titles = list(title_records)
+    linked_titles = [(t, t) for t in distinct_titles if len(title_records[t]) > 1]
+    formatted_titles = [format_title(title) for title in distinct_titles]
+    linked_titles += [(distinct_titles[i], distinct_titles[j]) for i, j in near_duplicate_pairs(formatted_titles)]
+
+    for title_i, title_j in linked_titles:
+        group = title_records[title_i] + (title_records[title_j] if title_j != title_i else [])
+        first = group[0]
+        for i in group[1:]:
+            if not _union(parents, root_dois, first, i):
+                continue
+            matched_by.setdefault(first, set()).add("title")
+            matched_by.setdefault(i, set()).add("title")
+
+    groups = {}
+    for i in range(len(records)):
+        groups.setdefault(_find(parents, i), []).append(i)
+    duplicate_groups = []
+    for members in groups.values():
+        if len(members) > 1:
+            match = set().union(*(matched_by.get(i, set()) for i in members))
+            duplicate_groups.append({"match": "+".join(sorted(match)), "records": members})
+    return sorted(duplicate_groups, key=lambda group: group["records"][0])
+
+
+def duplicate_report(records: list) -> dict:
+    """
+    Report with the groups of duplicates (records in input order).
+    """
+    groups = find_duplicates(records)
+    return {
+        "n_records": len(records),
+        "n_groups": len(groups),
+        "n_duplicates": sum(len(group["records"]) - 1 for group in groups),
+        "groups": [{"match": group["match"], "records": [records[i] for i in group["records"]]} for group in groups],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find duplicated papers in issues.json or in the bibliography")
+    parser.add_argument("--issues", type=Path, default=None, help="issues.json file")
+    parser.add_argument("--bib", type=Path, default=None, help="BibTeX file (default: the bibliography)")
+    parser.add_argument("--output", type=Path, default=DUPLICATES_FILE, help="Report file")
+    args = parser.parse_args()
+
+    if args.issues is not None:
+        records = list(iter_issues_json_records(args.issues))
+    else:
+        records = list(iter_bibliography_records(MATHONCO_BIB_FILE if args.bib is None else args.bib))
+    report = duplicate_report(records)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"{report['n_duplicates']} duplicates in {report['n_groups']} groups "
+                 f"among {report['n_records']} records, written to {args.output}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,90 @@
+"""
+Conditional fetch of the Substack feed.
+
+The ETag and Last-Modified headers of the last feed processed are stored next to the response cache
+(`cache/feed.json`, kept between workflow runs), with the latest issue of the bibliography at that time. The
+next fetch sends them back, so an unchanged feed is answered with 304 Not Modified and no body. The stored
+validators are only used if the bibliography still starts with the same issue.
+"""
+import os
+import re
+import json
+import logging
+from pathlib import Path
+import requests
+from src.cache import CACHE_FILE
+from src.http_client import HttpClient, get_default_client
+from src.storage import atomic_write
+
+
+FEED_URL = os.environ.get("MATHONCO_FEED_URL", "https://thisweekmathonco.substack.com/feed")
+
+ITEM_TITLE_PATTERN = re.compile(rb"<item>.*?<title>(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?</title>", re.DOTALL)
+
+
+def get_feed_state_file() -> Path:
+    """
+    File with the validators of the last feed processed, or None if the cache is disabled.
+    """
+    if CACHE_FILE.lower() in ("", "0", "off", "none"):
+        return None
+    return Path(CACHE_FILE).parent / "feed.json"
+
+
+def load_feed_state(state_file: Path = None) -> dict:
+    state_file = get_feed_state_file() if state_file is None else Path(state_file)
+    if (state_file is None) or (not state_file.exists()):
+        return {}
+    try:
+        with open(state_file, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        logging.warning(f"Could not read {state_file}, fetching the whole feed")
+        return {}
+
+
+def save_feed_state(response: requests.Response, latest_issue_number: int, state_file: Path = None):
+    """
+    Store the validators of the feed response, once its issues are in the bibliography.
+    """
+    state_file = get_feed_state_file() if state_file is None else Path(state_file)
+    if (state_file is None) or (response is None) or (response.status_code != 200):
+        return
+    state = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified"),
+             "latest_issue": latest_issue_number}
+    atomic_write(state_file, json.dumps(state))
+
+
+def fetch_feed(latest_issue_number: int, url: str = FEED_URL, client: HttpClient = None,
+               state_file: Path = None) -> requests.Response:
+    """
+    GET the feed, conditionally if the stored validators are for the same latest issue. Return the response
+    (status 304 if the feed did not change), or None if the feed could not be fetched: as with the previous
+    `feedparser.parse(url)`, a network failure means no new issue this run, and no feed state is saved.
+    """
+    client = get_default_client() if client is None else client
+    state = load_feed_state(state_file)
+    headers = {}
+    if state.get("latest_issue") == latest_issue_number:
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+    try:
+        return client.get(url, headers=headers or None)
+    except requests.RequestException as error:
+        logging.warning(f"Could not fetch the feed {url}: {error}")
+        return None
+
+
+def latest_feed_issue(content: bytes) -> int:
+    """
+    Highest issue number in the item titles of the raw feed, or None if they cannot be read.
+    """
+    issue_numbers = []
+    for title in ITEM_TITLE_PATTERN.findall(content):
+        last_word = title.strip().split(b" ")[-1]
+        if not last_word.isdigit():
+            return None
+        issue_numbers.append(int(last_word))
+    return max(issue_numbers) if issue_numbers else None
@@ -0,0 +1,138 @@
+"""
+Shared HTTP client for all the network calls (Substack feed, Crossref, doi.org content negotiation, OpenAlex).
+
+The client keeps a keep-alive connection pool per host, rate limits the requests to each host, retries
+429/5xx responses and connection errors with exponential backoff and jitter within a per-call time budget,
+and counts requests, retries, bytes and latency per host. The requests can go through a record/replay
+transport (see `src/replay.py`).
+"""
+import time
+import random
+import logging
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from src.ratelimit import RateLimiter
+from src.replay import get_default_transport
+from src.metrics import Metrics, get_default_metrics
+
+
+# total time allowed for a call, including retries (s)
+DEFAULT_TIMEOUT_BUDGET = 60
+# timeout of a single attempt (s)
+DEFAULT_ATTEMPT_TIMEOUT = 30
+# retries after the first attempt
+DEFAULT_MAX_RETRIES = 4
+# backoff before retry n: BACKOFF_BASE * 2**n, plus up to 100% jitter (s)
+BACKOFF_BASE = 0.5
+# size of the connection pool for each host
+POOL_SIZE = 16
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class HttpClient:
+    """
+    Pooled, rate-limited HTTP client with retries and per-host counters.
+    """
+
+    def __init__(self, rate_limiter: RateLimiter = None, timeout_budget: float = DEFAULT_TIMEOUT_BUDGET,
+                 attempt_timeout: float = DEFAULT_ATTEMPT_TIMEOUT, max_retries: int = DEFAULT_MAX_RETRIES,
+                 transport=None, metrics: Metrics = None):
+        self.rate_limiter = RateLimiter() if rate_limiter is None else rate_limiter
+        self.timeout_budget = timeout_budget
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        # None for the network, or an object with a `send(session, url, params, headers, timeout)` method
+        self.transport = transport
+        self.metrics = get_default_metrics() if metrics is None else metrics
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def _count(self, host: str, **increments):
+        with self.lock:
+            counters = self.counters.setdefault(
+                host, {"requests": 0, "retries": 0, "failures": 0, "bytes": 0, "latency": 0.0}
+            )
+            for name, value in increments.items():
+                counters[name] += value
+
+    def _send(self, url: str, params: dict, headers: dict, timeout: float) -> requests.Response:
+        if self.transport is None:
+            return self.session.get(url, params=params, headers=headers, timeout=timeout)
+        return self.transport.send(self.session, url, params, headers, timeout)
+
+    def get(self, url: str, params: dict = None, headers: dict = None, timeout: float = None) -> requests.Response:
+        """
+        GET the url. 429/5xx responses and connection errors are retried until the time budget (`timeout`,
+        default `timeout_budget`) is over. The last response is returned, whatever its status code; if no
+        response could be obtained, the last exception is raised.
+        """
+        host = urlparse(url).netloc
+        deadline = time.monotonic() + (self.timeout_budget if timeout is None else timeout)
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            self.rate_limiter.acquire(url)
+            start = time.monotonic()
+            try:
+                response = self._send(url, params, headers, max(0.1, min(self.attempt_timeout, remaining)))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                latency = time.monotonic() - start
+                self._count(host, requests=1, failures=1, latency=latency)
+                self.metrics.observe_request(host, latency)
+                error, response = e, None
+            else:
+                latency = time.monotonic() - start
+                self._count(host, requests=1, bytes=len(response.content), latency=latency)
+                self.metrics.observe_request(host, latency, len(response.content), response.status_code)
+                self.rate_limiter.update_from_headers(url, response.headers)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                error = None
+
+            # wait before retrying, honouring Retry-After if given
+            delay = BACKOFF_BASE * 2 ** attempt * (1 + random.random())
+            if (response is not None) and response.headers.get("retry-after", "").isdigit():
+                delay = max(delay, int(response.headers["retry-after"]))
+            if (attempt == self.max_retries) or (time.monotonic() + delay > deadline):
+                break
+            logging.warning(f"Retrying {url} in {delay:.2g} s "
+                            f"({error if response is None else response.status_code})")
+            self._count(host, retries=1)
+            time.sleep(delay)
+
+        if response is None:
+            raise error
+        return response
+
+    def summary(self) -> str:
+        """
+        One line per host with the counters.
+        """
+        lines = []
+        with self.lock:
+            for host, c in sorted(self.counters.items()):
+                mean_latency = c["latency"] / c["requests"] if c["requests"] > 0 else 0
+                lines.append(f"{host}: {c['requests']} requests, {c['retries']} retries, {c['failures']} failures, "
+                             f"{c['bytes'] / 1e6:.3g} MB, mean latency {mean_latency * 1000:.0f} ms")
+        return "\n".join(lines)
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> HttpClient:
+    """
+    Get the client shared by the whole process (recording or replaying if set by the environment).
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient(transport=get_default_transport())
+        return _default_client
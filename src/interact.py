@@ -1,25 +1,67 @@
+import time
+import argparse
+from pathlib import Path
+from src.bibstream import iter_issue_entries, parse_fields
+from src.issue_dates import ISSUE_DATES_FILE, get_issue_year_lookup
+from src.utils import MATHONCO_BIB_FILE
+from src.metrics import get_default_metrics, write_report_at_exit
 
-from src.postprocessing import _iter_issue_entries
-from src.utils import get_parsed_bibliography
 
+# maximum length of a Scopus query (characters)
+SCOPUS_QUERY_LIMIT = 4000
 
-def get_doi_list():
+
+def iter_dois(bib_file: Path = MATHONCO_BIB_FILE, first_issue: int = None, last_issue: int = None,
+              years: list = None, issue_dates_file: Path = ISSUE_DATES_FILE):
     """
-    Load the bibliography in the form of a list of DOIS to be used for Scopus.
+    Yield the DOIs of the bibliography with a single scan of the file (no BibTeX parsing), optionally only for
+    the issues between first_issue and last_issue (included) or published in the given years.
     """
-    # load bibliography
-    bib_content_parsed = get_parsed_bibliography()
+    metrics = get_default_metrics()
+    issue_year = get_issue_year_lookup(issue_dates_file) if years else None
+    n_entries = n_dois = 0
+    for issue_number, raw_entry in iter_issue_entries(bib_file):
+        # the bibliography is sorted from the newest issue
+        if (first_issue is not None) and (issue_number < first_issue):
+            break
+        if (last_issue is not None) and (issue_number > last_issue):
+            continue
+        if years and (issue_year(issue_number) not in years):
+            continue
+        n_entries += 1
+        doi = parse_fields(raw_entry).get("doi")
+        if doi is not None:
+            n_dois += 1
+            yield doi.strip()
+    metrics.count("entries", n_entries)
+    metrics.count("dois", n_dois)
 
-    # init output list
-    doi_list = []
 
-    for entry in bib_content_parsed.entries:
-        doi = bib_content_parsed.entries[entry].fields.get("doi")
-        if doi is not None:
-            doi_list.append(doi)
+def get_doi_list(bib_file: Path = MATHONCO_BIB_FILE, first_issue: int = None, last_issue: int = None,
+                 years: list = None) -> list:
+    """
+    Load the bibliography in the form of a list of DOIS to be used for Scopus.
+    """
+    with get_default_metrics().stage("bibliography_scan"):
+        return list(iter_dois(bib_file, first_issue, last_issue, years))
 
-    # return list of DOIs
-    return doi_list
+
+def iter_scopus_queries(doi_list, max_length: int = SCOPUS_QUERY_LIMIT):
+    """
+    Yield Scopus queries "DOI(...) OR DOI(...) ..." of at most max_length characters (a single DOI longer than
+    that gets a query of its own).
+    """
+    clauses, length = [], 0
+    for doi in doi_list:
+        clause = f"DOI({doi})"
+        # " OR " between clauses
+        if clauses and (length + len(" OR ") + len(clause) > max_length):
+            yield " OR ".join(clauses)
+            clauses, length = [], 0
+        length += len(clause) + (len(" OR ") if clauses else 0)
+        clauses.append(clause)
+    if clauses:
+        yield " OR ".join(clauses)
 
 
 def get_formatted_doi_list_for_scopus():
@@ -27,9 +69,69 @@ def get_formatted_doi_list_for_scopus():
     Load the bibliography in the form of a list of DOIS to be used for Scopus, formatted as a string.
     """
     doi_list = get_doi_list()
-    doi_list_formatted = " OR ".join([f"DOI({doi})" for doi in doi_list])
+    with get_default_metrics().stage("format_query"):
+        doi_list_formatted = " OR ".join([f"DOI({doi})" for doi in doi_list])
     return doi_list_formatted
 
 
+def search(query: str, n: int = 10, rebuild: bool = False):
+    """
+    Print the entries best matching the query, with their issue numbers.
+    """
+    start = time.perf_counter()
+    # the index needs numpy, only imported for this command
+    from src.search import SearchIndex, get_search_index
+    metrics = get_default_metrics()
+    with metrics.stage("index_update"):
+        if rebuild:
+            index = SearchIndex()
+            index.rebuild()
+        else:
+            index = get_search_index()
+    loaded = time.perf_counter()
+    with metrics.stage("search"):
+        results = index.search(query, n)
+    end = time.perf_counter()
+
+    for score, key, issue_number, title in results:
+        print(f"{score:6.2f}  Issue {issue_number:4d}  {key}  {title}")
+    print(f"{len(results)} results in {(end - start) * 1000:.2f} ms "
+          f"(index load and update {(loaded - start) * 1000:.2f} ms, query {(end - loaded) * 1000:.2f} ms)")
+
+
+def cli():
+    """
+    CLI for the program
+    """
+    parser = argparse.ArgumentParser(description="Query the MathOnco bibliography.")
+    subparsers = parser.add_subparsers(dest="command")
+    scopus_parser = subparsers.add_parser("scopus", help="Print the Scopus queries with the DOIs of the bibliography "
+                                                         "(default)")
+    scopus_parser.add_argument("--first-issue", type=int, default=None, help="Only DOIs from this issue on")
+    scopus_parser.add_argument("--last-issue", type=int, default=None, help="Only DOIs up to this issue")
+    scopus_parser.add_argument("--year", type=int, nargs="+", default=None, help="Only DOIs of the issues of these years")
+    scopus_parser.add_argument("--max-length", type=int, default=SCOPUS_QUERY_LIMIT,
+                               help=f"Maximum characters per query (default: {SCOPUS_QUERY_LIMIT})")
+    search_parser = subparsers.add_parser("search", help="Full-text search on titles, authors and abstracts")
+    search_parser.add_argument("query", nargs="+", help="Words to search")
+    search_parser.add_argument("-n", type=int, default=10, help="Number of results (default: 10)")
+    search_parser.add_argument("--rebuild", action="store_true", help="Index the whole bibliography again")
+    parser.set_defaults(first_issue=None, last_issue=None, year=None, max_length=SCOPUS_QUERY_LIMIT)
+    return parser.parse_args()
+
+
 def main():
-    print(get_formatted_doi_list_for_scopus())
+    args = cli()
+    write_report_at_exit("interact")
+    if args.command == "search":
+        search(" ".join(args.query), args.n, args.rebuild)
+    else:
+        doi_list = get_doi_list(first_issue=args.first_issue, last_issue=args.last_issue, years=args.year)
+        with get_default_metrics().stage("format_query"):
+            queries = list(iter_scopus_queries(doi_list, args.max_length))
+        # one query per paragraph
+        print("\n\n".join(queries))
+
+
+if __name__ == "__main__":
+    main()
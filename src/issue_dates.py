@@ -0,0 +1,56 @@
+"""
+Index of the MathOnco issues with their publication year and date (`res/issue_dates.csv`).
+
+The index is used to split the bibliography per year. `automatic_update.py` appends the date of each new issue
+from the Substack feed; the dates of the issues before the index was introduced are unknown, only their year is.
+"""
+import csv
+from pathlib import Path
+
+
+ISSUE_DATES_FILE = Path("res/issue_dates.csv")
+
+FIELDS = ["issue", "year", "date"]
+
+
+def load_issue_dates(index_file: Path = ISSUE_DATES_FILE) -> dict:
+    """
+    Load the index as {issue_number: (year, date)}; date is None if unknown.
+    """
+    issue_dates = {}
+    with open(index_file, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            date = row["date"] or None
+            year = int(row["year"]) if row["year"] else int(date[:4])
+            issue_dates[int(row["issue"])] = (year, date)
+    return issue_dates
+
+
+def get_issue_year_lookup(index_file: Path = ISSUE_DATES_FILE):
+    """
+    Get a function issue_number -> year. An issue missing from the index raises a KeyError: its year cannot
+    be guessed (e.g. around new year), the issue has to be added to the index.
+    """
+    issue_dates = load_issue_dates(index_file)
+
+    def issue_year(issue_number: int) -> int:
+        if issue_number not in issue_dates:
+            raise KeyError(f"Issue {issue_number} is not in {index_file}, add it with its year")
+        return issue_dates[issue_number][0]
+
+    return issue_year
+
+
+def record_issue_date(issue_number: int, date: str, index_file: Path = ISSUE_DATES_FILE):
+    """
+    Add an issue with its date (YYYY-MM-DD) to the index, if not already there.
+    """
+    index_file = Path(index_file)
+    if index_file.exists() and (int(issue_number) in load_issue_dates(index_file)):
+        return
+    write_header = not index_file.exists()
+    with open(index_file, "a", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        if write_header:
+            writer.writerow(FIELDS)
+        writer.writerow([int(issue_number), date[:4], date])
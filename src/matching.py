@@ -0,0 +1,87 @@
+"""
+Batched title matching for Crossref results.
+
+All candidate titles are scored at once with a q-gram Jaccard similarity computed with NumPy. Candidates
+whose length is too different from the query are discarded before scoring, and all the candidates above the
+Jaccard cutoff are verified with SequenceMatcher, using the same threshold as before.
+"""
+import zlib
+import logging
+from difflib import SequenceMatcher
+import numpy as np
+
+
+# similarity required to accept a title (SequenceMatcher ratio)
+SIMILARITY_THRESHOLD = 0.90
+
+# size of the q-grams
+Q = 3
+
+# minimum Jaccard similarity for a candidate to be verified
+MIN_JACCARD = 0.3
+
+# SequenceMatcher ratio 2M / (la + lb) can exceed the threshold only if min(la, lb) / max(la, lb) is above this
+MIN_LENGTH_RATIO = SIMILARITY_THRESHOLD / (2 - SIMILARITY_THRESHOLD)
+
+
+def format_title(title: str) -> str:
+    """
+    Format title for comparison, eliminating spaces, uppercases and BibTeX braces.
+    """
+    return title.replace("{", "").replace("}", "").replace(" ", "").lower()
+
+
+def qgram_hashes(formatted_title: str) -> np.ndarray:
+    """
+    Sorted unique hashes of the q-grams of the title.
+    """
+    grams = {formatted_title[i:i + Q] for i in range(max(1, len(formatted_title) - Q + 1))}
+    return np.unique(np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.int64, count=len(grams)))
+
+
+def jaccard_scores(formatted_title: str, candidate_titles: list) -> np.ndarray:
+    """
+    Q-gram Jaccard similarity between the title and each candidate, computed in a single pass.
+    """
+    if len(candidate_titles) == 0:
+        return np.zeros(0)
+    query = qgram_hashes(formatted_title)
+    candidates = [qgram_hashes(candidate) for candidate in candidate_titles]
+    sizes = np.array([len(c) for c in candidates])
+    owners = np.repeat(np.arange(len(candidates)), sizes)
+    shared = np.isin(np.concatenate(candidates), query, assume_unique=False)
+    intersections = np.bincount(owners, weights=shared, minlength=len(candidates))
+    return intersections / (sizes + len(query) - intersections)
+
+
+def best_match(title: str, items: list) -> dict:
+    """
+    Return the Crossref item whose title best matches the given title, or None if no item is similar
+    enough. Items are dicts with the keys 'title' (list of strings) and 'DOI'.
+    """
+    formatted_title = format_title(title)
+
+    # collect items having a title, discarding those with too different length
+    candidates, candidate_titles = [], []
+    for item in items:
+        try:
+            formatted_item_title = format_title(item["title"][0])
+        except (KeyError, IndexError):
+            logging.warning(f"Title not found in {item}")
+            continue
+        lengths = sorted((len(formatted_item_title), len(formatted_title)))
+        if lengths[1] == 0 or lengths[0] / lengths[1] < MIN_LENGTH_RATIO:
+            continue
+        candidates.append(item)
+        candidate_titles.append(formatted_item_title)
+
+    # score all candidates at once and verify those above the cutoff, best first
+    scores = jaccard_scores(formatted_title, candidate_titles)
+    best_ratio, best_item = SIMILARITY_THRESHOLD, None
+    for i in np.argsort(-scores, kind="stable"):
+        if scores[i] < MIN_JACCARD:
+            break
+        ratio = SequenceMatcher(None, candidate_titles[i], formatted_title).ratio()
+        if ratio > best_ratio:
+            best_ratio, best_item = ratio, candidates[i]
+    return best_item
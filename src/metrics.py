@@ -0,0 +1,129 @@
+"""
+Lightweight run metrics: wall time per stage, counters (entries processed, bytes read and written) and, for
+each host, the HTTP requests with a latency histogram.
+
+Each entry point calls `write_report_at_exit(name)`, and the metrics of the process are written at exit to
+`metrics/<name>.json` (set MATHONCO_METRICS to another folder, or to `off` to disable the report).
+"""
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+
+# folder of the reports (set MATHONCO_METRICS=off to disable them)
+METRICS_DIR = os.environ.get("MATHONCO_METRICS", "metrics")
+
+# upper bounds of the latency histogram buckets (s); the last bucket is unbounded
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Metrics:
+    """
+    Thread-safe collection of stage timings, counters and per-host HTTP metrics.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time the enclosed block as the given stage. Stages run by several threads add up their times.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(name, time.perf_counter() - start)
+
+    def add_stage_time(self, name: str, seconds: float):
+        with self.lock:
+            stage = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+            stage["calls"] += 1
+            stage["seconds"] += seconds
+
+    def count(self, name: str, value: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe_request(self, host: str, latency: float, n_bytes: int = 0, status: int = None):
+        """
+        Record an HTTP request to host. `status` is None if no response was received.
+        """
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+        with self.lock:
+            host_metrics = self.hosts.setdefault(host, {
+                "requests": 0, "errors": 0, "bytes": 0, "latency_seconds": 0.0, "status": {},
+                "latency_histogram": [0] * (len(LATENCY_BUCKETS) + 1),
+            })
+            host_metrics["requests"] += 1
+            host_metrics["bytes"] += n_bytes
+            host_metrics["latency_seconds"] += latency
+            host_metrics["latency_histogram"][bucket] += 1
+            if (status is None) or (status >= 400):
+                host_metrics["errors"] += 1
+            status_key = "none" if status is None else str(status)
+            host_metrics["status"][status_key] = host_metrics["status"].get(status_key, 0) + 1
+
+    def report(self, entry_point: str = None) -> dict:
+        """
+        Metrics as a JSON-serializable dict.
+        """
+        with self.lock:
+            return {
+                "entry_point": entry_point,
+                "started": self.started,
+                "wall_seconds": time.time() - self.started,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "counters": dict(self.counters),
+                "http": {
+                    "latency_buckets": list(LATENCY_BUCKETS),
+                    "hosts": {host: dict(host_metrics, status=dict(host_metrics["status"]),
+                                         latency_histogram=list(host_metrics["latency_histogram"]))
+                              for host, host_metrics in self.hosts.items()},
+                },
+            }
+
+    def write(self, path: Path, entry_point: str = None):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.report(entry_point), f, indent=2)
+
+
+_default_metrics = Metrics()
+
+
+def get_default_metrics() -> Metrics:
+    """
+    Get the metrics shared by the whole process.
+    """
+    return _default_metrics
+
+
+def write_report_at_exit(entry_point: str, metrics: Metrics = None):
+    """
+    Write the metrics to `METRICS_DIR/<entry_point>.json` when the process exits.
+    """
+    if METRICS_DIR == "off":
+        return
+    metrics = get_default_metrics() if metrics is None else metrics
+    report_file = Path(METRICS_DIR) / f"{entry_point}.json"
+
+    def write_report():
+        try:
+            metrics.write(report_file, entry_point)
+            logging.info(f"Metrics written to {report_file}")
+        except OSError as e:
+            logging.warning(f"Could not write the metrics to {report_file}: {e}")
+
+    atexit.register(write_report)
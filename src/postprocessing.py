@@ -1,20 +1,33 @@
-import re
+import os
 import json
 import logging
-from html import unescape
+import argparse
+import hashlib
 from pathlib import Path
 from collections import Counter
-import numpy as np
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
 import pybtex.scanner
 from tqdm import tqdm
 from pybtex.database import BibliographyData, parse_file
 from pybtex.database import parse_string as bibtex_parse_string
-from unidecode import unidecode
+from src.utils import get_bibtex_label
 import requests
+from src.cache import ResponseCache, get_default_cache
+from src.http_client import HttpClient, get_default_client
+from src.bibstream import iter_issue_entries, iter_issue_entries_from_text
+from src.dedup import find_duplicates, iter_issues_records, normalize_doi
+from src.metrics import get_default_metrics, write_report_at_exit
 
 
 logging.basicConfig(level=logging.DEBUG)
 
+# base url of OpenAlex (can be pointed to a local stand-in server, see benchmarks/stub_openalex.py)
+OPENALEX_API_URL = os.environ.get("OPENALEX_API_URL", "https://api.openalex.org")
+
+# maximum number of DOIs in a single OpenAlex filter
+OPENALEX_BATCH_SIZE = 50
+
 
 def print_info(issues_file: str):
     """
@@ -45,9 +58,8 @@ def print_info(issues_file: str):
         json.dump(papers_no_DOI, outfile, indent=2)
 
     # check if there are duplicates
-    papers_with_DOI = [doi for doi in all_DOIs if doi is not None]
-    unique_DOIs, counts = np.unique(np.array(papers_with_DOI), return_counts=True)
-    duplicated_DOIs = list(unique_DOIs[counts > 1])
+    doi_counts = Counter(normalize_doi(doi) for doi in all_DOIs if doi is not None)
+    duplicated_DOIs = [doi for doi, count in doi_counts.items() if count > 1]
     logging.info(f"N duplicates between papers with DOI: {len(duplicated_DOIs)}")
 
 
@@ -59,33 +71,25 @@ def remove_duplicates(issues_file: str, output_file: str = None):
     with open(issues_file, "r") as infile:
         issues_dict = json.load(infile)
 
-    # get dois for all papers
-    all_dois = [paper["DOI"] for papers in issues_dict.values() for paper in papers]
-
-    # check if there are duplicates
-    papers_with_DOI = [doi for doi in all_dois if doi is not None]
-    unique_DOIs, counts = np.unique(np.array(papers_with_DOI), return_counts=True)
-    duplicated_DOIs = list(unique_DOIs[counts > 1])
-    logging.info(f"N duplicates between papers with DOI: {len(duplicated_DOIs)}")
+    # group duplicates by normalized DOI and (near-)identical title
+    records = list(iter_issues_records(issues_dict))
+    groups = find_duplicates(records)
+    # keep the first paper of each group with a DOI (or the first paper, if none has one)
+    duplicates = set()
+    for group in groups:
+        kept = next((i for i in group["records"] if records[i]["doi"] is not None), group["records"][0])
+        duplicates.update(i for i in group["records"] if i != kept)
+    logging.info(f"N duplicates: {len(duplicates)} (in {len(groups)} groups)")
 
     # Remove duplicates
     unique_issues_dict = {}  # init new dict
-    duplicates_counter = Counter({doi: 0 for doi in duplicated_DOIs})  # init counter
+    record_id = 0
     for issue, papers_list in issues_dict.items():
         unique_issues_dict[issue] = []  # init issues
         for paper in papers_list:
-            # get doi
-            doi = paper["DOI"]  
-            # if doi in duplicates and was not added, add it
-            if (doi not in duplicated_DOIs):  
+            if record_id not in duplicates:
                 unique_issues_dict[issue].append(paper)
-            else:
-                if duplicates_counter[doi] == 0:
-                    unique_issues_dict[issue].append(paper)
-                    duplicates_counter[doi] += 1
-
-    # sort dict
-    sorted_dict = dict(sorted(unique_issues_dict.items(), key=lambda t: int(t[0]), reverse=True))
+            record_id += 1
 
     # Write json without duplicates
     if output_file is None:
@@ -124,30 +128,14 @@ def bibtex_writer(issues_file: str):
                     # get bibtex label and entry
                     bib_label, bib_entry = list(parsed_bibtex.entries.items())[0]
 
-                    # create label in the format surnameYEARfirstword, where:
-                    # - surname is the surname of the first author
-                    # - YEAR is the year of the paper
-                    # - first word is the first word of the title
-
-                    # get surname
-                    authors_list = list(bib_entry.persons.values())
-                    if len(authors_list) == 0:
+                    # create label in the format surnameYEARfirstword (skip entries without authors)
+                    bibtex_label = get_bibtex_label(bib_entry)
+                    if bibtex_label is None:
                         continue
-                    first_author_surname = authors_list[0][0].last_names[0]
-                    first_author_surname = first_author_surname.lower()
-                    first_author_surname = unidecode(first_author_surname)
-                    # get year
-                    year = bib_entry.fields["year"]
-                    # get first_word
-                    first_word, _ = bib_entry.fields["title"].split(" ", 1)
-                    if len(first_word) <= 3:
-                        word_1, word_2, _ = bib_entry.fields["title"].split(" ", 2)
-                        first_word = f"{word_1}{word_2}"
-                    first_word = first_word.lower()
-                
+
                     # set label of the bibtex
                     parsed_bibtex = BibliographyData({
-                        f"{first_author_surname}{year}{first_word}": bib_entry
+                        bibtex_label: bib_entry
                     })
                     # format bibtex
                     formatted_bibtex = parsed_bibtex.to_string('bibtex')
@@ -240,9 +228,10 @@ def _inverted_index_to_abstract(inv_index: dict) -> str:
     return " ".join(position_word[i] for i in sorted(position_word))
 
 
-def _get_crossref_abstract(doi: str, timeout: int = 12) -> str:
+def _get_crossref_abstract(doi: str, timeout: int = 12, cache: ResponseCache = None, client: HttpClient = None) -> str:
     """
     Retrieve abstract from Crossref for a DOI.
+    Abstracts (and DOIs without abstract) are stored in the response cache.
     """
     if doi is None:
         return None
@@ -251,15 +240,26 @@ def _get_crossref_abstract(doi: str, timeout: int = 12) -> str:
     if not doi:
         return None
 
+    # check the cache first
+    cache = get_default_cache() if cache is None else cache
+    if cache is not None:
+        hit, abstract = cache.get("openalex", doi)
+        if hit:
+            return abstract
+
     # Use OpenAlex API to get the abstract
-    url = f"https://api.openalex.org/works/https://doi.org/{doi}"
+    url = f"{OPENALEX_API_URL}/works/https://doi.org/{doi}"
 
     try:
-        r = requests.get(url, timeout=30)
+        client = get_default_client() if client is None else client
+        r = client.get(url)
         r.raise_for_status()
         work = r.json()
     except requests.HTTPError as e:
         logging.warning(f"HTTP error {e} for DOI: {doi}")
+        # a missing work is a negative result, other errors are retried on the next run
+        if (cache is not None) and (e.response is not None) and (e.response.status_code == 404):
+            cache.set("openalex", doi, None)
         return None
     except requests.RequestException:
         logging.warning(f"Failed to retrieve Crossref data for DOI: {doi}")
@@ -267,46 +267,169 @@ def _get_crossref_abstract(doi: str, timeout: int = 12) -> str:
     except ValueError:
         return None
 
-    return _inverted_index_to_abstract(work.get("abstract_inverted_index"))
+    abstract = _inverted_index_to_abstract(work.get("abstract_inverted_index"))
+    if cache is not None:
+        cache.set("openalex", doi, abstract)
+    return abstract
+
+
+def _fetch_openalex_batch(dois: list, client: HttpClient) -> dict:
+    """
+    Request the works of several DOIs with a single OpenAlex query. Return the abstracts by lowercase DOI;
+    DOIs unknown to OpenAlex are not in the result. Raise requests.RequestException on failure.
+    """
+    params = {
+        "filter": "doi:" + "|".join(dois),
+        "select": "doi,abstract_inverted_index",
+        "per-page": len(dois),
+    }
+    r = client.get(f"{OPENALEX_API_URL}/works", params=params)
+    r.raise_for_status()
+    abstracts = {}
+    for work in r.json()["results"]:
+        if work.get("doi") is None:
+            continue
+        work_doi = work["doi"].lower().removeprefix("https://doi.org/")
+        abstracts[work_doi] = _inverted_index_to_abstract(work.get("abstract_inverted_index"))
+    return abstracts
+
+
+def get_abstracts(dois: list, batch_size: int = OPENALEX_BATCH_SIZE, cache: ResponseCache = None,
+                  client: HttpClient = None) -> dict:
+    """
+    Retrieve the abstracts of many DOIs, requesting up to `batch_size` DOIs per OpenAlex query.
+    Return a dict DOI -> abstract (None when not available), with the same results as `_get_crossref_abstract`.
+    """
+    cache = get_default_cache() if cache is None else cache
+    client = get_default_client() if client is None else client
+    abstracts = {}
+
+    # collect the DOIs to be fetched
+    to_fetch = []
+    for doi in dict.fromkeys(dois):
+        if (doi is None) or (not doi.strip()):
+            abstracts[doi] = None
+            continue
+        if cache is not None:
+            hit, abstract = cache.get("openalex", doi.strip())
+            if hit:
+                abstracts[doi] = abstract
+                continue
+        # DOIs that would break the filter syntax are requested one by one
+        if ("|" in doi) or ("," in doi):
+            abstracts[doi] = _get_crossref_abstract(doi, cache=cache, client=client)
+            continue
+        to_fetch.append(doi)
+
+    # fetch in batches
+    for start in tqdm(range(0, len(to_fetch), batch_size), desc="Fetching abstracts"):
+        batch = to_fetch[start:start + batch_size]
+        try:
+            batch_abstracts = _fetch_openalex_batch([doi.strip() for doi in batch], client)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            # errors are not cached, so that the DOIs are retried on the next run
+            logging.warning(f"Failed to retrieve OpenAlex data for {len(batch)} DOIs: {e}")
+            abstracts.update({doi: None for doi in batch})
+            continue
+        for doi in batch:
+            # DOIs missing from the results are unknown to OpenAlex (negative result, as a 404)
+            abstract = batch_abstracts.get(doi.strip().lower())
+            abstracts[doi] = abstract
+            if cache is not None:
+                cache.set("openalex", doi.strip(), abstract)
+
+    return abstracts
 
 
 def _iter_issue_entries(bib_text: str):
     """
     Yield (issue_number, raw_entry) for each BibTeX entry in file order.
     """
-    issue_pattern = re.compile(r"//MathOnco Issue\s+(\d+)\s*\n")
-    issue_matches = list(issue_pattern.finditer(bib_text))
-
-    for i, issue_match in enumerate(issue_matches):
-        issue_number = int(issue_match.group(1))
-        start = issue_match.end()
-        end = issue_matches[i + 1].start() if i + 1 < len(issue_matches) else len(bib_text)
-        issue_block = bib_text[start:end]
-
-        for entry_match in re.finditer(r"@\w+\s*{", issue_block):
-            entry_start = entry_match.start()
-            brace_level = 0
-            entry_end = None
-            for pos, char in enumerate(issue_block[entry_start:], start=entry_start):
-                if char == "{":
-                    brace_level += 1
-                elif char == "}":
-                    brace_level -= 1
-                    if brace_level == 0:
-                        entry_end = pos + 1
-                        break
-
-            if entry_end is None:
-                logging.warning(f"Could not parse one entry in issue {issue_number}.")
-                continue
+    yield from iter_issue_entries_from_text(bib_text)
+
+
+def _build_record(issue_number: int, raw_entry: str) -> dict:
+    """
+    Parse a raw BibTeX entry and build its JSON record, without abstract (fetched afterwards in batches).
+    Return None if the entry cannot be parsed.
+    """
+    try:
+        parsed_entry = bibtex_parse_string(raw_entry, "bibtex")
+        key, entry = list(parsed_entry.entries.items())[0]
+    except Exception:
+        return None
+
+    # Preserve all people roles (author/editor/etc.) as strings.
+    persons_dict = {
+        role: [str(person) for person in person_list]
+        for role, person_list in entry.persons.items()
+    }
 
-            yield issue_number, issue_block[entry_start:entry_end]
+    fields = dict(entry.fields)
+
+    return {
+        "mathonco_issue": issue_number,
+        "entry_key": key,
+        "entry_type": entry.type,
+        "fields": fields,
+        "persons": persons_dict,
+        "raw_bibtex": raw_entry,
+        "abstract": None,
+    }
+
+
+def _build_records_chunk(chunk: list) -> list:
+    """
+    Build the records for a chunk of (position, issue_number, raw_entry) tuples (run in the worker processes).
+    Return (position, issue_number, record) tuples, where record is None for the entries that cannot be parsed.
+    """
+    return [(position, issue_number, _build_record(issue_number, raw_entry))
+            for position, issue_number, raw_entry in chunk]
+
+
+def _iter_chunks(iterable, chunk_size: int):
+    """
+    Group the elements of iterable in lists of chunk_size elements.
+    """
+    chunk = []
+    for element in iterable:
+        chunk.append(element)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
+def _entry_hash(raw_entry: str) -> str:
+    """
+    Content hash of a raw BibTeX entry.
+    """
+    return hashlib.sha256(raw_entry.encode("utf-8")).hexdigest()
+
+
+def _load_previous_records(output_path: Path) -> dict:
+    """
+    Load the records of a previous export, keyed by the content hash of their raw BibTeX.
+    """
+    if not output_path.exists():
+        return {}
+    try:
+        with open(output_path, "r") as f:
+            previous_publications = json.load(f)
+    except ValueError:
+        logging.warning(f"Could not read previous export {output_path}. Rebuilding it.")
+        return {}
+    return {_entry_hash(record["raw_bibtex"]): record for record in previous_publications}
 
 
 def convert_mathonco_bib_to_json(
     bib_file: str = "res/MathOncoBibliography.bib",
     output_file: str = "out/MathOncoBibliography.json",
     fetch_abstracts: bool = True,
+    workers: int = 1,
+    chunk_size: int = 64,
+    incremental: bool = False,
 ) -> list[dict]:
     """
     Convert MathOnco bibliography to a JSON list with one record per publication.
@@ -315,54 +438,103 @@ def convert_mathonco_bib_to_json(
     - all parsed BibTeX information (entry key, type, fields, persons)
     - the MathOnco issue number (`mathonco_issue`)
     - the abstract from Crossref when DOI is available
-    """
-    bib_path = Path(bib_file)
-    with open(bib_path, "r") as f:
-        bib_text = f.read()
 
-    publications = []
-    entries = list(_iter_issue_entries(bib_text))
-    for issue_number, raw_entry in tqdm(entries, total=len(entries), desc="Processing issues"):
-        try:
-            parsed_entry = bibtex_parse_string(raw_entry, "bibtex")
-            key, entry = list(parsed_entry.entries.items())[0]
-        except Exception:
-            logging.warning(f"Could not parse one entry in issue {issue_number}.")
-            continue
-
-        # Preserve all people roles (author/editor/etc.) as strings.
-        persons_dict = {
-            role: [str(person) for person in person_list]
-            for role, person_list in entry.persons.items()
-        }
-
-        fields = dict(entry.fields)
-        doi = fields.get("doi") or fields.get("DOI")
-        abstract = _get_crossref_abstract(doi) if fetch_abstracts else None
-
-        publications.append({
-            "mathonco_issue": issue_number,
-            "entry_key": key,
-            "entry_type": entry.type,
-            "fields": fields,
-            "persons": persons_dict,
-            "raw_bibtex": raw_entry,
-            "abstract": abstract,
-        })
+    With `workers` > 1, parsing and record building run on a process pool, in chunks of `chunk_size`
+    entries. Records are returned in file order in any case.
 
+    With `incremental`, the records of the previous output whose raw BibTeX is unchanged are reused,
+    abstracts included, and only new or edited entries are parsed and fetched.
+    """
+    bib_path = Path(bib_file)
     output_path = Path(output_file)
+    metrics = get_default_metrics()
+    metrics.count("bytes_read", bib_path.stat().st_size)
+
+    # entries are read lazily from the memory-mapped file
+    entries = ((position, issue_number, raw_entry)
+               for position, (issue_number, raw_entry) in enumerate(iter_issue_entries(bib_path)))
+
+    # reuse the records of unchanged entries
+    records = {}  # position -> record
+    if incremental:
+        with metrics.stage("load_previous_records"):
+            previous_records = _load_previous_records(output_path)
+        entries_to_parse = []
+        for position, issue_number, raw_entry in entries:
+            previous_record = previous_records.get(_entry_hash(raw_entry))
+            if previous_record is None:
+                entries_to_parse.append((position, issue_number, raw_entry))
+            else:
+                records[position] = dict(previous_record, mathonco_issue=issue_number)
+        logging.info(f"Reusing {len(records)} records from {output_path}, parsing {len(entries_to_parse)} entries")
+        metrics.count("entries_reused", len(records))
+        entries = entries_to_parse
+
+    # abstracts are fetched in batches once all entries are parsed
+    chunks = _iter_chunks(entries, chunk_size)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        if executor is not None:
+            chunk_records = executor.map(_build_records_chunk, chunks)
+        else:
+            chunk_records = (_build_records_chunk(chunk) for chunk in chunks)
+
+        with metrics.stage("build_records"), tqdm(desc="Processing issues") as pbar:
+            for position, issue_number, record in chain.from_iterable(chunk_records):
+                pbar.update(1)
+                metrics.count("entries_parsed")
+                if record is None:
+                    logging.warning(f"Could not parse one entry in issue {issue_number}.")
+                    continue
+                records[position] = record
+    finally:
+        # also on errors (e.g. KeyboardInterrupt), so that the workers do not outlive the call
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    publications = [records[position] for position in sorted(records)]
+
+    if fetch_abstracts:
+        get_record_doi = lambda record: record["fields"].get("doi") or record["fields"].get("DOI")
+        missing_abstract = [record for record in publications if record["abstract"] is None]
+        with metrics.stage("abstracts"):
+            abstracts = get_abstracts([get_record_doi(record) for record in missing_abstract])
+        for record in missing_abstract:
+            record["abstract"] = abstracts[get_record_doi(record)]
+
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "w") as f:
+    with metrics.stage("write"), open(output_path, "w") as f:
         json.dump(publications, f, indent=2)
+        metrics.count("bytes_written", f.tell())
+    metrics.count("entries", len(publications))
 
     logging.info(f"Saved {len(publications)} records to {output_path}")
+    if fetch_abstracts:
+        logging.info(f"HTTP requests:\n{get_default_client().summary()}")
     return publications
 
 
-
+def cli():
+    """
+    CLI for the program
+    """
+    parser = argparse.ArgumentParser(description="Convert the MathOnco bibliography to JSON.")
+    parser.add_argument("--workers", "-w",
+                        type=int,
+                        default=1,
+                        help="Number of processes used to parse the entries (default: 1)")
+    parser.add_argument("--incremental",
+                        action="store_true",
+                        help="Reuse the records of the previous export for unchanged entries")
+    parser.add_argument("--no_abstracts",
+                        action="store_true",
+                        help="Do not fetch the abstracts from OpenAlex")
+    return parser.parse_args()
 
 
 def main():
+    args = cli()
+    write_report_at_exit("postprocessing")
+
     # # 1. Remove duplicates 
     # remove_duplicates("out/issues.json", "out/issues_no_duplicates.json")
 
@@ -371,7 +543,8 @@ def main():
 
     # # # 3. DOI file
     # # text_file_writer()
-    convert_mathonco_bib_to_json()
+    convert_mathonco_bib_to_json(fetch_abstracts=not args.no_abstracts, workers=args.workers,
+                                 incremental=args.incremental)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+"""
+Per-host token-bucket rate limiting for the network calls made by the scraper.
+"""
+import threading
+import time
+from urllib.parse import urlparse
+
+
+# Crossref public pool defaults (see https://api.crossref.org/swagger-ui/index.html)
+DEFAULT_LIMIT = 50
+DEFAULT_INTERVAL = 1.0
+
+
+def parse_rate_limit_interval(interval: str) -> float:
+    """
+    Convert the value of the `X-Rate-Limit-Interval` header (e.g. "1s", "2m", "1h") in seconds.
+    """
+    interval = interval.strip()
+    scale = {"s": 1, "m": 60, "h": 3600}.get(interval[-1], None)
+    if scale is None:
+        return float(interval)
+    return float(interval[:-1]) * scale
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing `limit` requests every `interval` seconds.
+    """
+
+    def __init__(self, limit: int = DEFAULT_LIMIT, interval: float = DEFAULT_INTERVAL):
+        self.lock = threading.Lock()
+        self.capacity = max(1, int(limit))
+        self.fill_rate = self.capacity / interval  # tokens per second
+        self.tokens = float(self.capacity)
+        self.last_refill = time.monotonic()
+
+    def set_rate(self, limit: int, interval: float):
+        """
+        Change the rate of the bucket, keeping the tokens already available.
+        """
+        with self.lock:
+            self.capacity = max(1, int(limit))
+            self.fill_rate = self.capacity / interval
+            self.tokens = min(self.tokens, self.capacity)
+
+    def acquire(self):
+        """
+        Block until a token is available, then consume it.
+        """
+        while True:
+            with self.lock:
+                # refill the bucket with the tokens produced since the last call
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.fill_rate)
+                self.last_refill = now
+                # if a token is available, take it
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                # else, wait for the next one
+                wait = (1 - self.tokens) / self.fill_rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """
+    Collection of token buckets, one per host.
+    """
+
+    def __init__(self, default_limit: int = DEFAULT_LIMIT, default_interval: float = DEFAULT_INTERVAL):
+        self.default_limit = default_limit
+        self.default_interval = default_interval
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        """
+        Get the bucket for the host of the given url, creating it if necessary.
+        """
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.default_limit, self.default_interval)
+            return self.buckets[host]
+
+    def acquire(self, url: str):
+        """
+        Wait until a request to the host of the given url is allowed.
+        """
+        self.bucket(url).acquire()
+
+    def update_from_headers(self, url: str, headers):
+        """
+        Update the rate for the host of the given url using the `X-Rate-Limit-*` headers sent by Crossref.
+        """
+        limit = headers.get("x-rate-limit-limit")
+        interval = headers.get("x-rate-limit-interval")
+        if (limit is None) or (interval is None):
+            return
+        try:
+            limit = int(limit)
+            interval = parse_rate_limit_interval(interval)
+        except ValueError:
+            return
+        if limit > 0 and interval > 0:
+            self.bucket(url).set_rate(limit, interval)
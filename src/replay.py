@@ -0,0 +1,173 @@
+"""
+Record/replay of the HTTP calls made through `src.http_client.HttpClient` (Substack feed, Crossref, doi.org
+content negotiation, OpenAlex).
+
+In record mode, every response is appended to a cassette (a JSON Lines file, one request and response per
+line). In replay mode, the responses are served from the cassette without network, with an optional latency
+(fixed, or the one measured when recording) and injected errors, so that whole runs can be reproduced and timed
+offline. The mode is selected with environment variables:
+
+    MATHONCO_HTTP_MODE=record|replay          (default: live)
+    MATHONCO_CASSETTE=cassettes/http.jsonl
+    MATHONCO_REPLAY_LATENCY=0.2|recorded      (default: 0)
+    MATHONCO_REPLAY_ERROR_RATE=0.05           (default: 0)
+    MATHONCO_REPLAY_ERROR_STATUS=503          (0 for connection errors)
+"""
+import os
+import json
+import time
+import base64
+import random
+import logging
+import threading
+from http.client import responses as HTTP_REASONS
+from pathlib import Path
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+HTTP_MODE = os.environ.get("MATHONCO_HTTP_MODE", "live")
+CASSETTE_FILE = Path(os.environ.get("MATHONCO_CASSETTE", "cassettes/http.jsonl"))
+REPLAY_LATENCY = os.environ.get("MATHONCO_REPLAY_LATENCY", "0")
+REPLAY_ERROR_RATE = float(os.environ.get("MATHONCO_REPLAY_ERROR_RATE", "0"))
+REPLAY_ERROR_STATUS = int(os.environ.get("MATHONCO_REPLAY_ERROR_STATUS", "503"))
+REPLAY_SEED = int(os.environ.get("MATHONCO_REPLAY_SEED", "0"))
+
+# headers that do not apply to the stored (decoded) body
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class ReplayMissError(requests.RequestException):
+    """
+    No response recorded for the request.
+    """
+
+
+def request_key(url: str, params: dict = None, headers: dict = None) -> str:
+    """
+    Key of a GET request in the cassette: the full url (with sorted parameters) and the Accept header, which
+    selects the format in content negotiation.
+    """
+    full_url = requests.Request("GET", url, params=sorted(params.items()) if params else None).prepare().url
+    accept = CaseInsensitiveDict(headers or {}).get("accept")
+    return f"GET {full_url}" if accept is None else f"GET {full_url} accept={accept}"
+
+
+def make_interaction(key: str, status: int, headers: dict, content: bytes, elapsed: float = 0.0) -> dict:
+    """
+    Cassette record of a response. The body is stored as text when possible, base64 otherwise.
+    """
+    interaction = {
+        "request": key,
+        "status": status,
+        "headers": {name: value for name, value in headers.items() if name.lower() not in DROPPED_HEADERS},
+        "elapsed": round(elapsed, 4),
+    }
+    try:
+        interaction["body"] = content.decode("utf-8")
+    except UnicodeDecodeError:
+        interaction["body_base64"] = base64.b64encode(content).decode("ascii")
+    return interaction
+
+
+def make_response(url: str, status: int, headers: dict, content: bytes) -> requests.Response:
+    """
+    Build a `requests.Response` without network.
+    """
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response.reason = HTTP_REASONS.get(status, "")
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = content
+    return response
+
+
+class CassetteRecorder:
+    """
+    Transport sending the requests through the session and appending each response to the cassette.
+    """
+
+    def __init__(self, cassette_file: Path = CASSETTE_FILE):
+        self.cassette_file = Path(cassette_file)
+        self.cassette_file.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+
+    def write(self, interaction: dict):
+        line = json.dumps(interaction) + "\n"
+        with self.lock, open(self.cassette_file, "a") as f:
+            f.write(line)
+
+    def send(self, session: requests.Session, url: str, params: dict, headers: dict, timeout: float):
+        start = time.monotonic()
+        response = session.get(url, params=params, headers=headers, timeout=timeout)
+        self.write(make_interaction(request_key(url, params, headers), response.status_code, response.headers,
+                                    response.content, time.monotonic() - start))
+        return response
+
+
+class CassetteReplayer:
+    """
+    Transport serving the responses recorded in the cassette, with the given latency (seconds, or "recorded")
+    and a fraction `error_rate` of the requests failing with `error_status` (0 for a connection error).
+    If a request was recorded more than once, the last response is served.
+    """
+
+    def __init__(self, cassette_file: Path = CASSETTE_FILE, latency=0.0, error_rate: float = 0.0,
+                 error_status: int = 503, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.interactions = {}
+        with open(cassette_file, "r") as f:
+            for line in f:
+                if line.endswith("\n"):
+                    interaction = json.loads(line)
+                    self.interactions[interaction["request"]] = interaction
+        logging.info(f"Replaying {len(self.interactions)} responses from {cassette_file}")
+
+    def send(self, session: requests.Session, url: str, params: dict, headers: dict, timeout: float):
+        key = request_key(url, params, headers)
+        interaction = self.interactions.get(key)
+        if interaction is None:
+            raise ReplayMissError(f"No recorded response for {key}")
+
+        # simulate the latency
+        delay = interaction["elapsed"] if self.latency == "recorded" else self.latency
+        if delay > timeout:
+            time.sleep(timeout)
+            raise requests.Timeout(f"Replayed latency {delay} s over the timeout for {key}")
+        time.sleep(delay)
+
+        # inject errors
+        with self.lock:
+            failed = self.rng.random() < self.error_rate
+        if failed:
+            if self.error_status == 0:
+                raise requests.ConnectionError(f"Injected connection error for {key}")
+            return make_response(url, self.error_status, {}, b"")
+
+        if "body" in interaction:
+            content = interaction["body"].encode("utf-8")
+        else:
+            content = base64.b64decode(interaction["body_base64"])
+        return make_response(url, interaction["status"], interaction["headers"], content)
+
+
+def get_default_transport():
+    """
+    Transport selected by the environment: None (live), a recorder or a replayer.
+    """
+    if HTTP_MODE == "record":
+        logging.info(f"Recording HTTP responses to {CASSETTE_FILE}")
+        return CassetteRecorder(CASSETTE_FILE)
+    if HTTP_MODE == "replay":
+        latency = REPLAY_LATENCY if REPLAY_LATENCY == "recorded" else float(REPLAY_LATENCY)
+        return CassetteReplayer(CASSETTE_FILE, latency, REPLAY_ERROR_RATE, REPLAY_ERROR_STATUS, REPLAY_SEED)
+    if HTTP_MODE != "live":
+        raise ValueError(f"Unknown MATHONCO_HTTP_MODE: {HTTP_MODE}")
+    return None
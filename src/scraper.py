@@ -1,27 +1,48 @@
 """
 Scrape MathOnco Newsletter. Get json file containing papers for each issue.
 """
+import os
 import re
-import json
+import time
 import argparse
 import logging
 from pathlib import Path
-from difflib import SequenceMatcher
-import requests
-from tqdm import tqdm
-from bs4 import BeautifulSoup
-from crossref.restful import Works, Etiquette
-from habanero import cn
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from src.http_client import HttpClient, get_default_client
+from src.cache import ResponseCache, get_default_cache
+from src.title_index import TitleIndex, get_default_title_index
+from src.matching import best_match
+from src.checkpoint import append_checkpoint, compact, completed_issues, repair_journal, seed_journal
+from src.metrics import get_default_metrics, write_report_at_exit
 
 
 # config logger
 logging.basicConfig(level=logging.INFO)
 
-# get etiquette for CrossRef
+# etiquette for CrossRef
 config = {
     "email": "franco.pradelli94@gmail.com"
 }
-my_etiquette = Etiquette('Newsletter Bibliography Scraper', '1.0', '...', config["email"])
+_etiquette = None
+
+# base urls of the services (can be pointed to a local stub server, see benchmarks/stub_crossref.py)
+CROSSREF_API_URL = os.environ.get("CROSSREF_API_URL", "https://api.crossref.org")
+DOI_RESOLVER_URL = os.environ.get("DOI_RESOLVER_URL", "https://doi.org")
+
+# number of results requested for each Crossref query (the page size of the previous crossref.restful loop)
+CROSSREF_ROWS = 100
+
+
+def get_etiquette():
+    """
+    Get the CrossRef etiquette, built on first use (crossref is slow to import).
+    """
+    global _etiquette
+    if _etiquette is None:
+        from crossref.restful import Etiquette
+        _etiquette = Etiquette('Newsletter Bibliography Scraper', '1.0', '...', config["email"])
+    return _etiquette
 
 
 def cli():
@@ -47,6 +68,23 @@ def cli():
                         type=str,
                         help="Output format for the scraped papers (you can choose among those supported by CrossRef API https://api.crossref.org/v1/styles)")
 
+    # add flag for concurrent enrichment
+    parser.add_argument("--workers", "-w",
+                        type=int,
+                        default=1,
+                        help="Number of papers enriched concurrently (default: 1, sequential)")
+
+    # add flag for compaction
+    parser.add_argument("--compact",
+                        action="store_true",
+                        help="Only write out/issues.json from the checkpoint journal (out/issues.journal.jsonl)")
+
+    # add flag for parallel backfill
+    parser.add_argument("--jobs", "-j",
+                        type=int,
+                        default=1,
+                        help="Number of issues processed in parallel (default: 1, sequential)")
+
     return parser.parse_args()
 
 
@@ -74,9 +112,25 @@ def get_issue_number(input_issue: str) -> int:
     return int(issue_number)
 
 
-def get_publications_from_issue(soup: BeautifulSoup, issue_number: int) -> dict:
+# tags needed to find the publications: section headers (h3), banners (source, img) and links (a)
+ISSUE_STRAINER = SoupStrainer(["h3", "source", "img", "a"])
+
+
+def make_issue_soup(html, only_relevant: bool = False, features: str = "html.parser") -> BeautifulSoup:
     """
-    Get publications from the MathOnco issue and return them as dict.
+    Parse the html of a MathOnco issue.
+
+    :param only_relevant: parse only the tags used by `get_publications_from_issue` (faster).
+    :param features: parser used by BeautifulSoup (e.g. "lxml", if installed).
+    """
+    parse_only = ISSUE_STRAINER if only_relevant else None
+    return BeautifulSoup(html, features, parse_only=parse_only)
+
+
+def find_issue_sections(soup: BeautifulSoup, issue_number: int) -> tuple:
+    """
+    Get the elements marking the start of the publications section and the start of the following section
+    (None if not found).
 
     :param soup: parsed html of the MathOnco issue.
     """
@@ -170,25 +224,40 @@ def get_publications_from_issue(soup: BeautifulSoup, issue_number: int) -> dict:
             # when you found both, break
             if (section_publications is not None) and (following_section is not None):
                 break
-    
+
+    return section_publications, following_section
+
+
+def get_publications_from_issue(soup: BeautifulSoup, issue_number: int) -> dict:
+    """
+    Get publications from the MathOnco issue and return them as dict.
+
+    :param soup: parsed html of the MathOnco issue.
+    """
+    section_publications, following_section = find_issue_sections(soup, issue_number)
+
     if (section_publications is None) or (following_section is None):
         logging.info(f"Found no papers section")
         issue_dict = {issue_number: []}
     else:
-        # get all tags 'a' following the publications section
-        all_next_a = section_publications.find_all_next('a')
-        
-        # get all tags 'a' before the following section
-        all_prevous_a = following_section.find_all_previous('a')
-
-        # get common elements
-        intersection = list(set(all_next_a).intersection(all_prevous_a))
+        # get all tags 'a' between the publications section and the following section, walking the
+        # document once, in order
+        publications = []
+        seen = set()
+        for element in section_publications.next_elements:
+            if element is following_section:
+                break
+            # Again, visually inspecting the result I found out that not all the 'a' elements are papers.
+            # papers can be selected just filtering out the elements conaining the 'class'.
+            # Identical elements are kept once.
+            if isinstance(element, Tag) and (element.name == 'a') and ('class' not in element.attrs.keys()) \
+                    and (element not in seen):
+                seen.add(element)
+                publications.append(element)
+        else:
+            # the following section is not after the publications section
+            publications = []
 
-        # Again, visually inspecting the result I found out that not all common elements are papers.
-        # papers can be selected just filtering out the elements conaining the 'class'
-        publications = [element for element in intersection
-                        if ('class' not in element.attrs.keys())]
-        
         # store paper link and title in a dict
         issue_dict = {issue_number: [{"title": p.text, "link": p.get('href')} for p in publications]}
 
@@ -199,43 +268,69 @@ def get_publications_from_issue(soup: BeautifulSoup, issue_number: int) -> dict:
     return issue_dict
 
 
-def get_doi(title: str, crossref: Works = None) -> str:
+def _query_crossref_works(title: str, rows: int = CROSSREF_ROWS, client: HttpClient = None) -> list:
     """
-    Get DOI for publication given its title
+    Get the first `rows` Crossref works matching the given title, with a single request.
+    """
+    client = get_default_client() if client is None else client
+    url = f"{CROSSREF_API_URL}/works"
+    params = {
+        "query.bibliographic": title,
+        "select": "DOI,title",
+        "rows": rows
+    }
+    response = client.get(url, params=params, headers={"user-agent": str(get_etiquette())})
+    if response.status_code == 404:
+        return []
+    response.raise_for_status()
+    return response.json()["message"]["items"]
+
+
+def get_doi(title: str, client: HttpClient = None, cache: ResponseCache = None,
+            title_index: TitleIndex = None) -> str:
+    """
+    Get DOI for publication given its title.
+    Titles already in the bibliography are resolved offline. Results of Crossref queries (including
+    titles without DOI) are stored in the response cache.
+    """
+    # check the titles already in the bibliography
+    title_index = get_default_title_index() if title_index is None else title_index
+    doi = title_index.lookup(title)
+    if doi is not None:
+        logging.info(f"DOI from bibliography: {doi}")
+        return doi
+
+    # check the cache
+    cache = get_default_cache() if cache is None else cache
+    if cache is not None:
+        hit, doi = cache.get("crossref", title)
+        if hit:
+            logging.info(f"DOI from cache: {doi}")
+            return doi
+
+    doi = _search_doi(title, client)
+    if cache is not None:
+        cache.set("crossref", title, doi)
+    return doi
+
+
+def _search_doi(title: str, client: HttpClient = None) -> str:
+    """
+    Search the DOI of the publication on Crossref
     """
-    # Define function to format titles for comparison
-    format_title = lambda s: s.replace(" ", "").lower()
-
-    # Format title eliminating spaces and uppercases
-    formatted_title = format_title(title)
-
     # log
     logging.info(f"Retriving doi for paper: {title}")
 
-    # Init CrossRef if necessary
-    works = Works(etiquette=my_etiquette) if crossref is None else crossref
-
-    # Iterate on the first N results
-    search_limit = 100
-    for i, element in enumerate(works.query(bibliographic=title).select('title', 'DOI')):
-        # format title
-        try:
-            formatted_element_title = format_title(element["title"][0])
-        except KeyError:
-            logging.warning(f"Title not found in {element}")
-            continue
-        # check the sequence
-        sm = SequenceMatcher(None, formatted_element_title, formatted_title)
-        # if the similarity ratio is above 95%, get the DOI
-        if sm.ratio() > 0.90:
-            # if the title match, return DOI
-            logging.info(f"Found DOI: {element['DOI']}")
-            return element["DOI"]
-        # Else return none
-        if i > search_limit:
-            logging.info(f"doi not found")
-            return None
-    
+    # Score the first N results at once and keep the best match
+    with get_default_metrics().stage("crossref_search"):
+        items = _query_crossref_works(title, CROSSREF_ROWS, client)
+    element = best_match(title, items)
+    if element is None:
+        logging.info(f"doi not found")
+        return None
+    logging.info(f"Found DOI: {element['DOI']}")
+    return element["DOI"]
+
 
 MONTH_MACROS = {
     "jan": "jan", "january": "jan",
@@ -271,37 +366,153 @@ def normalize_bibtex_month(bibtex: str) -> str:
     return re.sub(r"(month\s*=\s*)([A-Za-z]+)(\s*[,}])", replace, bibtex, flags=re.IGNORECASE)
 
 
-def get_formatted_citation(doi: str, citation_format: str = "bibtex") -> str:
+def _content_negotiation(doi: str, citation_format: str, client: HttpClient) -> str:
+    """
+    Get the citation through DOI content negotiation, as done by `habanero.cn.content_negotiation`.
+    """
+    from habanero.cn_formats import cn_format_headers
+    accept = cn_format_headers[citation_format]
+    if citation_format == "citeproc-json":
+        url = f"{CROSSREF_API_URL}/works/{doi}/{accept}"
+    else:
+        if citation_format == "text":
+            accept = f"{accept}; style = apa; locale = en-US"
+        url = f"{DOI_RESOLVER_URL}/{doi}"
+    response = client.get(url, headers={"Accept": accept, "user-agent": str(get_etiquette())})
+    response.raise_for_status()
+    response.encoding = "UTF-8"
+    return response.text
+
+
+def get_formatted_citation(doi: str, citation_format: str = "bibtex", client: HttpClient = None,
+                           cache: ResponseCache = None) -> str:
     """
     Given the DOI, get the citation formatted in the given style (see supported formats here: https://api.crossref.org/v1/styles).
     Default is bibtex.
     """
-    # use content negotiation from habanero to get bibtex
+    client = get_default_client() if client is None else client
+    cache = get_default_cache() if cache is None else cache
+    # use content negotiation to get bibtex
     if doi[0] == "/":
         current_doi = doi[1:]
     else:
         current_doi = doi
-    bibtex = cn.content_negotiation(ids=current_doi, format=citation_format)
+    # check the cache first
+    cache_request = f"{citation_format} {current_doi}"
+    hit, bibtex = (False, None) if cache is None else cache.get("content_negotiation", cache_request)
+    if not hit:
+        with get_default_metrics().stage("content_negotiation"):
+            bibtex = _content_negotiation(current_doi, citation_format, client)
+        if cache is not None:
+            cache.set("content_negotiation", cache_request, bibtex)
     if citation_format == "bibtex":
         bibtex = normalize_bibtex_month(bibtex)
     return bibtex
 
 
-def enrich_publications(issue_dict: dict, issue_number: int, citation_format: str = "bibtex") -> dict:
+def _enrich_article(article_dict: dict, citation_format: str, client: HttpClient) -> dict:
     """
-    Enrich issue dict with DOI and BibTex
+    Add DOI and formatted citation to a single publication.
     """
-    new_issue_dict = {issue_number: []}  # define new dict
+    article_dict["DOI"] = get_doi(article_dict["title"], client)  # add DOI to the publication
+    if article_dict["DOI"] is None:
+        article_dict[citation_format] = None
+    else:
+        article_dict[citation_format] = get_formatted_citation(article_dict["DOI"], citation_format, client)
+    return article_dict
 
-    for article_dict in issue_dict[issue_number]:
-        article_dict["DOI"] = get_doi(article_dict["title"])  # add DOI to each publication
-        if article_dict["DOI"] is None:
-            article_dict[citation_format] = None
-        else:
-            article_dict[citation_format] = get_formatted_citation(article_dict["DOI"], citation_format)
-        new_issue_dict[issue_number].append(article_dict)  # append publication to the new dict
 
-    return new_issue_dict
+def enrich_publications(issue_dict: dict, issue_number: int, citation_format: str = "bibtex",
+                        workers: int = 1, client: HttpClient = None) -> dict:
+    """
+    Enrich issue dict with DOI and BibTex.
+
+    If `workers` > 1, the publications are enriched concurrently on a thread pool. All threads share
+    the same HTTP client (and its per-host rate limiter) and the publications are returned in the same
+    order as the input.
+    """
+    client = get_default_client() if client is None else client
+    enrich = lambda article_dict: _enrich_article(article_dict, citation_format, client)
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            enriched_articles = list(executor.map(enrich, issue_dict[issue_number]))
+    else:
+        enriched_articles = [enrich(article_dict) for article_dict in issue_dict[issue_number]]
+
+    return {issue_number: enriched_articles}
+
+
+def _parse_issue(issue, issue_number: int) -> dict:
+    """
+    Parse an issue (html file or html text) and get the dict of its publications.
+    """
+    if isinstance(issue, Path):
+        with open(issue, "r") as html_file:
+            current_soup = make_issue_soup(html_file, only_relevant=True)
+    else:
+        current_soup = make_issue_soup(issue, only_relevant=True)
+    return get_publications_from_issue(current_soup, issue_number)
+
+
+def _extract_issue(issue, issue_number: int) -> dict:
+    with get_default_metrics().stage("issue_extraction"):
+        return _parse_issue(issue, issue_number)
+
+
+def _timed_parse_issue(issue, issue_number: int) -> tuple:
+    """
+    (issue dict, parsing time in s), for the process pool: the metrics of the worker processes are not reported,
+    the time is added to the metrics of the parent.
+    """
+    start = time.perf_counter()
+    issue_dict = _parse_issue(issue, issue_number)
+    return issue_dict, time.perf_counter() - start
+
+
+def _enrich_issue(issue_dict: dict, issue_number: int, citation_format: str = "bibtex", workers: int = 1) -> dict:
+    with get_default_metrics().stage("enrichment"):
+        return enrich_publications(issue_dict, issue_number, citation_format, workers=workers)
+
+
+def _extract_and_enrich_issue(issue, issue_number: int, citation_format: str = "bibtex", workers: int = 1) -> dict:
+    return _enrich_issue(_extract_issue(issue, issue_number), issue_number, citation_format, workers)
+
+
+def process_issues(pending_issues: list, citation_format: str = "bibtex", workers: int = 1, jobs: int = 1,
+                   ordered: bool = False, processes: bool = True):
+    """
+    Extract and enrich the publications of the given (issue, issue_number) pairs. Yield (issue_number, issue_dict)
+    as the issues are completed or, if `ordered`, in the order of `pending_issues` (each issue as soon as it and
+    the ones before it are completed).
+
+    With `jobs` > 1, the html is parsed on a pool of `jobs` processes (or on the threads enriching the issues, if
+    not `processes`) and up to `jobs` issues are enriched at the same time (each with `workers` threads).
+    """
+    if jobs <= 1:
+        for issue, issue_number in pending_issues:
+            yield issue_number, _extract_and_enrich_issue(issue, issue_number, citation_format, workers)
+        return
+
+    issue_numbers = [issue_number for _, issue_number in pending_issues]
+    with ThreadPoolExecutor(max_workers=jobs) as thread_pool:
+        if processes:
+            with ProcessPoolExecutor(max_workers=jobs) as process_pool:
+                # enrichment of each issue starts as soon as its extraction is done
+                extracted_issues = process_pool.map(_timed_parse_issue, [issue for issue, _ in pending_issues],
+                                                    issue_numbers)
+                futures = {}
+                for (issue_dict, seconds), issue_number in zip(extracted_issues, issue_numbers):
+                    get_default_metrics().add_stage_time("issue_extraction", seconds)
+                    future = thread_pool.submit(_enrich_issue, issue_dict, issue_number, citation_format, workers)
+                    futures[future] = issue_number
+        else:
+            futures = {
+                thread_pool.submit(_extract_and_enrich_issue, issue, issue_number, citation_format, workers): issue_number
+                for issue, issue_number in pending_issues
+            }
+        for future in (futures if ordered else as_completed(futures)):
+            yield futures[future], future.result()
 
 
 def main():
@@ -312,11 +523,20 @@ def main():
     # get cli
     args = cli()
     input_url = args.url
+    metrics = get_default_metrics()
+    write_report_at_exit("scraper")
+
+    # only compact the journal, if asked
+    if args.compact:
+        with metrics.stage("compact"):
+            compact(out_json_file)
+        return 0
 
     # build input list given the user input
     if args.url is not None:
         # if the input is an URL; use requests to get the html text
-        response = requests.get(input_url)
+        with metrics.stage("issue_fetch"):
+            response = get_default_client().get(input_url)
         if response.raise_for_status() is None:
             mathonco_issue_html = response.text
             # create a list of a single element
@@ -330,66 +550,58 @@ def main():
         mathonco_html_list = list(input_directory.glob("*.html"))
     elif args.file is not None:
         # if the input is a single html file, convert it to path
-        mathonco_html_list = [Path(args.f)]
+        mathonco_html_list = [Path(args.file)]
     else:
         logging.error("User input not recognized.")
         return 1
 
-    # get the issues already parsed
-    if out_json_file.exists():
-        with open(out_json_file, "r") as infile:
-            output_dict = json.load(infile)
-            collected_issue_numbers = list(output_dict.keys())
-    else:
-        output_dict = {}
-        collected_issue_numbers = []
-
-    # set up pbar
-    pbar_file = open("./pbar.o", "w")
+    # get the issues already parsed from the checkpoint journal
+    with metrics.stage("journal_load"):
+        seed_journal(out_json_file)
+        repair_journal()
+        collected_issue_numbers = completed_issues()
 
-    # iterate on the issues
-    for issue in tqdm(mathonco_html_list, file=pbar_file):
-        # make soup
+    # collect the issues to process
+    pending_issues = []
+    for issue in mathonco_html_list:
+        # get issue number
         if isinstance(issue, Path):
-            # if path, read it and make soup
-            with open(issue, "r") as html_file:
-                current_soup = BeautifulSoup(html_file, 'html.parser')
-            # get issue number
             issue_number = get_issue_number(str(issue))
         else:
-            # else, just make soup
-            current_soup = BeautifulSoup(issue, 'html.parser')
-            # get issue number
             issue_number = get_issue_number(args.url)
 
         # if number already done, skip
-        if (str(issue_number) in collected_issue_numbers) or (issue_number in collected_issue_numbers):
+        if issue_number in collected_issue_numbers:
             logging.info(f"Number already present in issues.json")
             continue
+        pending_issues.append((issue, issue_number))
 
-        # get issue dict containing the publications for the issue
-        issue_dict = get_publications_from_issue(current_soup, issue_number)
-        # enrich with DOI and formatted cit
-        if args.output_format is None:
-            issue_dict = enrich_publications(issue_dict, issue_number)
-        else:
-            issue_dict = enrich_publications(issue_dict, issue_number, citation_format=args.output_format)
+    # set up pbar
+    from tqdm import tqdm
+    pbar_file = open("./pbar.o", "w")
 
-        # extend output_dict
+    # iterate on the issues
+    citation_format = "bibtex" if args.output_format is None else args.output_format
+    processed_issues = process_issues(pending_issues, citation_format, args.workers, args.jobs)
+    for issue_number, issue_dict in tqdm(processed_issues, total=len(pending_issues), file=pbar_file):
+        metrics.count("issues")
+        metrics.count("papers", len(issue_dict[issue_number]))
+        # an issue without papers is not checkpointed, so that it is retried on the next run
         if len(issue_dict[issue_number]) == 0:
             logging.warning(f"No papers found for issue {issue_number}")
-        else:
-            output_dict.update(issue_dict)
+            continue
+        # save checkpoint
+        with metrics.stage("checkpoint"):
+            append_checkpoint(issue_number, issue_dict[issue_number])
 
     # close pbar file
     pbar_file.close()
+    logging.info(get_default_title_index().stats())
+    logging.info(f"HTTP requests:\n{get_default_client().summary()}")
 
-    # sort output dict
-    sorted_dict = dict(sorted(output_dict.items(), key=lambda t: int(t[0]), reverse=True))
-
-    # write
-    with open(out_json_file, "w") as outfile:
-        json.dump(sorted_dict, outfile, indent=2)
+    # write sorted issues.json from the journal
+    with metrics.stage("compact"):
+        compact(out_json_file)
 
 
 if __name__ == "__main__":
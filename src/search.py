@@ -0,0 +1,296 @@
+"""
+BM25 full-text index over the titles, authors and abstracts of the bibliography.
+
+The index is a list of immutable segments in `out/search_index`, each a set of NumPy arrays (term offsets,
+postings, term frequencies, document lengths, issues) loaded with memory mapping, plus its vocabulary and
+document list. New issues are indexed into a new segment; when there are more than `MAX_SEGMENTS`, all
+segments are merged into one from their postings. BM25 statistics are computed over all segments at query time.
+The list of segments and indexed issues is in `manifest.json`, replaced atomically after each update.
+"""
+import re
+import json
+import shutil
+import logging
+from pathlib import Path
+import numpy as np
+from unidecode import unidecode
+from src.bibstream import iter_issue_entries, parse_fields, parse_header
+from src.storage import atomic_write, latest_issue
+from src.utils import MATHONCO_BIB_FILE
+
+
+INDEX_DIR = Path("out/search_index")
+RECORDS_FILE = Path("out/MathOncoBibliography.json")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# segments kept before merging them
+MAX_SEGMENTS = 8
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into", "is", "it", "its", "of", "on",
+    "or", "that", "the", "their", "this", "to", "via", "we", "with",
+}
+
+
+def tokenize(text: str) -> list:
+    """
+    Lowercase ASCII words of the text, without stopwords and single characters.
+    """
+    return [token for token in TOKEN_PATTERN.findall(unidecode(text).lower())
+            if (len(token) > 1) and (token not in STOPWORDS)]
+
+
+def iter_documents(bib_file: Path = MATHONCO_BIB_FILE, records_file: Path = RECORDS_FILE, issues: set = None):
+    """
+    Yield (key, issue_number, title, text) for the entries of the bibliography (only of the given issues, if
+    any). The text includes the abstract from the JSON export, when available.
+    """
+    abstracts = {}
+    if Path(records_file).exists():
+        with open(records_file, "r") as f:
+            abstracts = {record["entry_key"]: record["abstract"] for record in json.load(f) if record.get("abstract")}
+
+    for issue_number, raw_entry in iter_issue_entries(bib_file):
+        if (issues is not None) and (issue_number not in issues):
+            continue
+        key = parse_header(raw_entry)[1]
+        fields = parse_fields(raw_entry)
+        title = fields.get("title", "").replace("{", "").replace("}", "")
+        text = " ".join([title, fields.get("author", ""), abstracts.get(key, "")])
+        yield key, issue_number, title, text
+
+
+class Segment:
+    """
+    Read-only segment of the index, with memory-mapped arrays.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / "terms.json", "r") as f:
+            self.terms = json.load(f)
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        with open(self.path / "docs.json", "r") as f:
+            self.docs = json.load(f)
+        self.offsets = np.load(self.path / "offsets.npy", mmap_mode="r")
+        self.postings = np.load(self.path / "postings.npy", mmap_mode="r")
+        self.frequencies = np.load(self.path / "frequencies.npy", mmap_mode="r")
+        self.lengths = np.load(self.path / "lengths.npy", mmap_mode="r")
+        self.issues = np.load(self.path / "issues.npy", mmap_mode="r")
+
+    def document_frequency(self, term: str) -> int:
+        term_id = self.term_ids.get(term)
+        return 0 if term_id is None else int(self.offsets[term_id + 1] - self.offsets[term_id])
+
+    def postings_of(self, term: str) -> tuple:
+        """
+        (doc ids, term frequencies) of the term.
+        """
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return None, None
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.postings[start:end], self.frequencies[start:end]
+
+    def triplets(self) -> tuple:
+        """
+        All postings as (terms, term ids, doc ids, frequencies), to merge segments.
+        """
+        term_ids = np.repeat(np.arange(len(self.terms), dtype=np.int32), np.diff(self.offsets))
+        return self.terms, term_ids, np.asarray(self.postings), np.asarray(self.frequencies)
+
+
+def write_segment(path: Path, terms: list, term_ids: np.ndarray, doc_ids: np.ndarray, frequencies: np.ndarray,
+                  lengths: np.ndarray, issues: np.ndarray, docs: list):
+    """
+    Write a segment from its postings, given as parallel arrays of (term id, doc id, frequency).
+    """
+    path = Path(path)
+    path.mkdir(parents=True)
+    order = np.lexsort((doc_ids, term_ids))
+    counts = np.bincount(term_ids, minlength=len(terms))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    np.save(path / "offsets.npy", offsets)
+    np.save(path / "postings.npy", doc_ids[order].astype(np.int32))
+    np.save(path / "frequencies.npy", frequencies[order].astype(np.int32))
+    np.save(path / "lengths.npy", np.asarray(lengths, dtype=np.int32))
+    np.save(path / "issues.npy", np.asarray(issues, dtype=np.int32))
+    with open(path / "terms.json", "w") as f:
+        json.dump(terms, f)
+    with open(path / "docs.json", "w") as f:
+        json.dump(docs, f)
+
+
+def build_segment(path: Path, documents) -> int:
+    """
+    Index the documents (key, issue_number, title, text) into a new segment. Return the number of documents.
+    """
+    term_ids = {}
+    postings_terms, postings_docs, postings_frequencies = [], [], []
+    lengths, issues, docs = [], [], []
+    for doc_id, (key, issue_number, title, text) in enumerate(documents):
+        tokens = tokenize(text)
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            postings_terms.append(term_ids.setdefault(token, len(term_ids)))
+            postings_docs.append(doc_id)
+            postings_frequencies.append(count)
+        lengths.append(len(tokens))
+        issues.append(issue_number)
+        docs.append([key, title])
+
+    write_segment(path, list(term_ids), np.array(postings_terms, dtype=np.int32),
+                  np.array(postings_docs, dtype=np.int32), np.array(postings_frequencies, dtype=np.int32),
+                  lengths, issues, docs)
+    return len(docs)
+
+
+def merge_segments(path: Path, segments: list):
+    """
+    Write a single segment with the documents of all the given segments.
+    """
+    terms = sorted(set().union(*(segment.terms for segment in segments)))
+    global_ids = {term: i for i, term in enumerate(terms)}
+    all_term_ids, all_doc_ids, all_frequencies = [], [], []
+    doc_offset = 0
+    for segment in segments:
+        segment_terms, term_ids, doc_ids, frequencies = segment.triplets()
+        mapping = np.array([global_ids[term] for term in segment_terms], dtype=np.int32)
+        all_term_ids.append(mapping[term_ids])
+        all_doc_ids.append(doc_ids + doc_offset)
+        all_frequencies.append(frequencies)
+        doc_offset += len(segment.docs)
+    write_segment(path, terms, np.concatenate(all_term_ids), np.concatenate(all_doc_ids),
+                  np.concatenate(all_frequencies), np.concatenate([segment.lengths for segment in segments]),
+                  np.concatenate([segment.issues for segment in segments]),
+                  [doc for segment in segments for doc in segment.docs])
+
+
+class SearchIndex:
+    """
+    BM25 index made of segments.
+    """
+
+    def __init__(self, index_dir: Path = INDEX_DIR):
+        self.index_dir = Path(index_dir)
+        manifest_file = self.index_dir / "manifest.json"
+        if manifest_file.exists():
+            with open(manifest_file, "r") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"segments": [], "issues": [], "next_segment": 0}
+        self.segments = [Segment(self.index_dir / name) for name in self.manifest["segments"]]
+
+    def __len__(self) -> int:
+        return sum(len(segment.docs) for segment in self.segments)
+
+    def _new_segment_path(self) -> Path:
+        name = f"segment_{self.manifest['next_segment']:06d}"
+        self.manifest["next_segment"] += 1
+        # remove what an interrupted update may have left
+        shutil.rmtree(self.index_dir / name, ignore_errors=True)
+        return self.index_dir / name
+
+    def _commit(self, segment_names: list, issues: set):
+        """
+        Replace the manifest, then delete the segments no longer listed.
+        """
+        old_names = set(self.manifest["segments"])
+        self.manifest["segments"] = segment_names
+        self.manifest["issues"] = sorted(issues)
+        atomic_write(self.index_dir / "manifest.json", json.dumps(self.manifest))
+        for name in old_names - set(segment_names):
+            shutil.rmtree(self.index_dir / name, ignore_errors=True)
+        self.segments = [Segment(self.index_dir / name) for name in segment_names]
+
+    def update(self, bib_file: Path = MATHONCO_BIB_FILE, records_file: Path = RECORDS_FILE) -> int:
+        """
+        Index the issues of the bibliography not in the index yet, in a new segment. Return the number of
+        new documents.
+        """
+        indexed_issues = set(self.manifest["issues"])
+        # the bibliography is newest first: nothing to index if its first issue is already indexed
+        if (len(indexed_issues) > 0) and (latest_issue(bib_file) <= max(indexed_issues)):
+            return 0
+        new_issues = {issue_number for issue_number, _ in iter_issue_entries(bib_file)} - indexed_issues
+        if len(new_issues) == 0:
+            return 0
+
+        segment_path = self._new_segment_path()
+        n_documents = build_segment(segment_path, iter_documents(bib_file, records_file, new_issues))
+        segment_names = self.manifest["segments"] + [segment_path.name]
+        self._commit(segment_names, indexed_issues | new_issues)
+        logging.info(f"Indexed {n_documents} entries of {len(new_issues)} issues in {segment_path}")
+
+        if len(self.segments) > MAX_SEGMENTS:
+            self.merge()
+        return n_documents
+
+    def rebuild(self, bib_file: Path = MATHONCO_BIB_FILE, records_file: Path = RECORDS_FILE) -> int:
+        """
+        Index the whole bibliography again (e.g. after new abstracts were exported or entries were edited).
+        """
+        self._commit([], set())
+        return self.update(bib_file, records_file)
+
+    def merge(self):
+        """
+        Merge all segments into one.
+        """
+        segment_path = self._new_segment_path()
+        merge_segments(segment_path, self.segments)
+        self._commit([segment_path.name], set(self.manifest["issues"]))
+        logging.info(f"Merged the index into {segment_path}")
+
+    def search(self, query: str, n: int = 10) -> list:
+        """
+        The `n` best entries for the query, as (score, key, issue_number, title), best first.
+        """
+        terms = set(tokenize(query))
+        n_docs = len(self)
+        if (n_docs == 0) or (len(terms) == 0):
+            return []
+        average_length = sum(float(segment.lengths.sum()) for segment in self.segments) / n_docs
+
+        # inverse document frequency over all segments
+        idf = {}
+        for term in terms:
+            df = sum(segment.document_frequency(term) for segment in self.segments)
+            if df > 0:
+                idf[term] = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+        candidates = []
+        for segment in self.segments:
+            scores = np.zeros(len(segment.docs))
+            length_norm = K1 * (1 - B + B * segment.lengths / average_length)
+            for term, term_idf in idf.items():
+                doc_ids, frequencies = segment.postings_of(term)
+                if doc_ids is None:
+                    continue
+                scores[doc_ids] += term_idf * frequencies * (K1 + 1) / (frequencies + length_norm[doc_ids])
+            best = np.flatnonzero(scores)
+            if len(best) > n:
+                # keep the ties with the n-th score, they are ordered by key below
+                nth_score = -np.partition(-scores[best], n - 1)[n - 1]
+                best = best[scores[best] >= nth_score]
+            for i in best:
+                key, title = segment.docs[i]
+                candidates.append((float(scores[i]), key, int(segment.issues[i]), title))
+        # ties are broken by key, so that the order does not depend on the segments
+        return sorted(candidates, key=lambda candidate: (-candidate[0], candidate[1]))[:n]
+
+
+def get_search_index(index_dir: Path = INDEX_DIR, bib_file: Path = MATHONCO_BIB_FILE,
+                     records_file: Path = RECORDS_FILE) -> SearchIndex:
+    """
+    Load the index, indexing the issues added to the bibliography since the last update.
+    """
+    index = SearchIndex(index_dir)
+    index.update(bib_file, records_file)
+    return index
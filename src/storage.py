@@ -0,0 +1,119 @@
+"""
+Append-only storage for the bibliography.
+
+New issues are written to a journal, one segment per issue, each with an atomic rename. The newest-first
+`MathOncoBibliography.bib` is then materialized once, prepending all pending segments to the current file.
+The result is byte-identical to prepending each issue in turn, but costs a single write. Segments of issues that
+are already at the top of the bibliography (left by a crash between the write and the journal cleanup) are
+removed instead of being prepended again.
+"""
+import os
+import re
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+from src.utils import MATHONCO_BIB_FILE
+from src.metrics import get_default_metrics
+
+
+JOURNAL_DIR = Path("res/.journal")
+
+SEGMENT_PATTERN = re.compile(r"issue_(\d+)\.bib")
+ISSUE_LINE_PATTERN = re.compile(r"//MathOnco Issue (\d+)")
+
+
+def _atomic_replace(path: Path, write):
+    """
+    Replace path atomically: call write(file) on a temporary file in the same folder, then rename it.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+            get_default_metrics().count("bytes_written", os.fstat(f.fileno()).st_size)
+        # mkstemp creates the file with mode 0600
+        if path.exists():
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def atomic_write(path: Path, text: str):
+    """
+    Write text to path atomically: write a temporary file in the same folder, then rename it.
+    """
+    _atomic_replace(path, lambda f: f.write(text))
+
+
+def append_issue(issue_number: int, formatted_bib: str, journal_dir: Path = JOURNAL_DIR):
+    """
+    Add the formatted bibliography of a new issue to the journal.
+    """
+    atomic_write(Path(journal_dir) / f"issue_{issue_number}.bib", formatted_bib)
+
+
+def pending_issues(journal_dir: Path = JOURNAL_DIR) -> list[int]:
+    """
+    Issue numbers in the journal not yet materialized, in ascending order.
+    """
+    journal_dir = Path(journal_dir)
+    if not journal_dir.exists():
+        return []
+    issue_numbers = [int(match.group(1)) for match in
+                     (SEGMENT_PATTERN.fullmatch(p.name) for p in journal_dir.iterdir()) if match]
+    return sorted(issue_numbers)
+
+
+def latest_issue(bib_file: Path = MATHONCO_BIB_FILE) -> int:
+    """
+    Issue number on the first line of the (newest first) bibliography, or 0 if it has none.
+    """
+    bib_file = Path(bib_file)
+    if not bib_file.exists():
+        return 0
+    with open(bib_file, "r") as f:
+        match = ISSUE_LINE_PATTERN.match(f.readline().strip())
+    return int(match.group(1)) if match else 0
+
+
+def materialize(bib_file: Path = MATHONCO_BIB_FILE, journal_dir: Path = JOURNAL_DIR) -> int:
+    """
+    Prepend the journal segments (newest first) to the bibliography, with a single atomic write, and
+    clear the journal. Return the number of materialized issues.
+    """
+    bib_file = Path(bib_file)
+    journal_dir = Path(journal_dir)
+    issue_numbers = pending_issues(journal_dir)
+
+    # drop segments already in the bibliography (crash after the replace, before clearing the journal)
+    latest_issue_number = latest_issue(bib_file)
+    for issue_number in [n for n in issue_numbers if n <= latest_issue_number]:
+        logging.warning(f"Issue {issue_number} is already in {bib_file}, removing it from the journal")
+        (journal_dir / f"issue_{issue_number}.bib").unlink()
+    issue_numbers = [n for n in issue_numbers if n > latest_issue_number]
+    if len(issue_numbers) == 0:
+        return 0
+
+    # write new file: segments, newest first, followed by the current bibliography
+    def write(out_file):
+        for issue_number in reversed(issue_numbers):
+            with open(journal_dir / f"issue_{issue_number}.bib", "r") as segment:
+                shutil.copyfileobj(segment, out_file)
+        if bib_file.exists():
+            with open(bib_file, "r") as f:
+                shutil.copyfileobj(f, out_file)
+
+    _atomic_replace(bib_file, write)
+
+    # clear journal
+    for issue_number in issue_numbers:
+        (journal_dir / f"issue_{issue_number}.bib").unlink()
+    logging.info(f"Materialized issues {issue_numbers} into {bib_file}")
+    return len(issue_numbers)
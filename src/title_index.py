@@ -0,0 +1,130 @@
+"""
+Offline title -> DOI resolver built from the existing bibliography.
+
+Papers are often featured in more than one TWiMO issue, so many titles can be resolved without asking
+Crossref. Titles are looked up first by their normalized hash and then, for slightly different titles,
+through a character trigram index with the same similarity threshold used by `get_doi`. As in `best_match`, the
+most similar title above the threshold wins. Exact lookups take about a microsecond; approximate ones count the
+trigram postings and take about a millisecond, still far below a Crossref query.
+"""
+import logging
+import threading
+from pathlib import Path
+from collections import Counter
+from difflib import SequenceMatcher
+from src.bibstream import iter_issue_entries, parse_fields
+from src.matching import SIMILARITY_THRESHOLD, format_title
+from src.utils import MATHONCO_BIB_FILE
+
+
+# number of trigram candidates verified with SequenceMatcher
+N_CANDIDATES = 5
+
+
+def _trigrams(formatted_title: str) -> set:
+    return {formatted_title[i:i + 3] for i in range(len(formatted_title) - 2)}
+
+
+def _iter_title_doi(bib_file: Path):
+    """
+    Yield (title, DOI) for each entry of the bibliography having both.
+    """
+    for _, raw_entry in iter_issue_entries(bib_file):
+        fields = parse_fields(raw_entry)
+        if ("title" in fields) and ("doi" in fields):
+            yield fields["title"], fields["doi"]
+
+
+class TitleIndex:
+    """
+    In-memory title -> DOI index with a hit-rate counter.
+    """
+
+    def __init__(self):
+        self.titles = []  # formatted titles
+        self.dois = []
+        self.exact = {}  # formatted title -> position
+        self.postings = {}  # trigram -> positions
+        self.lookups = 0
+        self.hits = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_bibliography(cls, bib_file: Path):
+        """
+        Build the index from a .bib file.
+        """
+        index = cls()
+        bib_file = Path(bib_file)
+        if not bib_file.exists():
+            logging.warning(f"Bibliography {bib_file} not found. The title index is empty.")
+            return index
+        for title, doi in _iter_title_doi(bib_file):
+            index.add(title, doi)
+        logging.info(f"Title index: {len(index.titles)} titles from {bib_file}")
+        return index
+
+    def add(self, title: str, doi: str):
+        """
+        Add a title to the index.
+        """
+        formatted_title = format_title(title)
+        if formatted_title in self.exact:
+            return
+        position = len(self.titles)
+        self.titles.append(formatted_title)
+        self.dois.append(doi)
+        self.exact[formatted_title] = position
+        for trigram in _trigrams(formatted_title):
+            self.postings.setdefault(trigram, []).append(position)
+
+    def lookup(self, title: str) -> str:
+        """
+        Get the DOI for the given title, or None if no indexed title is similar enough.
+        """
+        formatted_title = format_title(title)
+        doi = self._lookup(formatted_title)
+        with self.lock:
+            self.lookups += 1
+            if doi is not None:
+                self.hits += 1
+        return doi
+
+    def _lookup(self, formatted_title: str) -> str:
+        # exact match
+        position = self.exact.get(formatted_title)
+        if position is not None:
+            return self.dois[position]
+
+        # approximate match: the most similar of the titles sharing more trigrams
+        counts = Counter()
+        for trigram in _trigrams(formatted_title):
+            counts.update(self.postings.get(trigram, ()))
+        best_ratio, best_position = SIMILARITY_THRESHOLD, None
+        for position, _ in counts.most_common(N_CANDIDATES):
+            ratio = SequenceMatcher(None, self.titles[position], formatted_title).ratio()
+            if ratio > best_ratio:
+                best_ratio, best_position = ratio, position
+        return None if best_position is None else self.dois[best_position]
+
+    def stats(self) -> str:
+        """
+        Summary of the lookups, i.e. how many Crossref queries were saved.
+        """
+        hit_rate = (self.hits / self.lookups * 100) if self.lookups > 0 else 0
+        return f"Title index: {self.hits} / {self.lookups} titles resolved offline ({hit_rate:.3g}%)"
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_default_title_index() -> TitleIndex:
+    """
+    Get the index built from the MathOnco bibliography, building it on first use.
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = TitleIndex.from_bibliography(MATHONCO_BIB_FILE)
+        return _default_index
@@ -1,7 +1,10 @@
-import numpy as np
-import pandas as pd
+import os
+import mmap
 from pathlib import Path
-from pybtex.database import parse_string as bibtex_parse_string
+from unidecode import unidecode
+from src.bibstream import iter_issue_spans
+from src.metrics import get_default_metrics
+from src.issue_dates import ISSUE_DATES_FILE, get_issue_year_lookup
 
 
 MATHONCO_BIB_FILE = Path("res/MathOncoBibliography.bib")
@@ -14,108 +17,125 @@ def get_parsed_bibliography(bib_file_txt = MATHONCO_BIB_FILE):
     # load bibliography
     with open(bib_file_txt, "r") as f:
         bib_content = f.read()
+    get_default_metrics().count("bytes_read", os.path.getsize(bib_file_txt))
 
-    # load content
+    # load content (pybtex is imported here, most callers do not need it)
+    from pybtex.database import parse_string as bibtex_parse_string
     bib_content_parsed = bibtex_parse_string(bib_content, "bibtex")
 
     return bib_content_parsed
 
 
-def split_bib_per_issue(bib_file_txt = Path("res/MathOncoBibliography.bib")):
+def normalize_surname(surname: str) -> str:
     """
-    Split a bib file into separate issues
+    Lowercase ASCII version of a surname, used in labels and to match authors.
     """
-    # generate output folder
-    output_folder = bib_file_txt.parent / "single_issues"
-    output_folder.mkdir(exist_ok=True)
-
-    # read the bib file
-    with open(bib_file_txt, "r") as f:
-        bib_content = f.read()
+    return unidecode(surname.lower())
 
-    # split the bib file into separate issues
-    issues = bib_content.split("//MathOnco Issue ")[1:]
 
-    # get issue number
-    issue_numbers = [issue.split("\n")[0] for issue in issues]
-    issue_numbers = [int(n) for n in issue_numbers]
-
-    # re-add the comment at the beginning of each issue
-    issues = [f"//MathOnco Issue {issue}" for issue in issues]
-
-    # write each issue to a separate file
-    for issue, issue_number in zip(issues, issue_numbers):
-        with open(output_folder / f"issue_{issue_number}.bib", "w") as f:
-            f.write(issue)
-    print(f"Split {len(issues)} issues into {output_folder}")
+def get_bibtex_label(bib_entry) -> str:
+    """
+    Create label in the format surnameYEARfirstword, where:
+    - surname is the surname of the first author
+    - YEAR is the year of the paper
+    - first word is the first word of the title (first two words if the first is up to 3 letters)
+    Return None if the entry has no authors.
+    """
+    # get surname
+    authors_list = list(bib_entry.persons.values())
+    if len(authors_list) == 0:
+        return None
+    first_author_surname = authors_list[0][0].last_names[0]
+    first_author_surname = normalize_surname(first_author_surname)
+    # get year
+    year = bib_entry.fields["year"]
+    # get first_word
+    first_word, _ = bib_entry.fields["title"].split(" ", 1)
+    if len(first_word) <= 3:
+        word_1, word_2, _ = bib_entry.fields["title"].split(" ", 2)
+        first_word = f"{word_1}{word_2}"
+    first_word = first_word.lower()
+
+    return f"{first_author_surname}{year}{first_word}"
+
+
+def split_bibliography(bib_file_txt = MATHONCO_BIB_FILE, per_issue: bool = True, per_year: bool = True,
+                       issue_dates_file = ISSUE_DATES_FILE):
+    """
+    Split a bib file into separate issues (`single_issues/issue_N.bib`) and separate years
+    (`single_years/issues_in_year_YEAR.bib`, oldest issue first), in a single pass over the memory-mapped file.
+    Each issue is written as soon as it is read, so memory does not grow with the file. The year of each
+    issue comes from the issue dates index.
+    """
+    bib_file_txt = Path(bib_file_txt)
+    issues_folder = bib_file_txt.parent / "single_issues"
+    years_folder = bib_file_txt.parent / "single_years"
+    if per_issue:
+        issues_folder.mkdir(exist_ok=True)
+    if per_year:
+        years_folder.mkdir(exist_ok=True)
+        issue_year = get_issue_year_lookup(issue_dates_file)
+
+    with open(bib_file_txt, "rb") as f:
+        # empty files cannot be mapped
+        if f.seek(0, 2) == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            # the file is newest first: go through the issues from the oldest
+            issue_spans = list(iter_issue_spans(buffer))
+            year_files = {}
+            try:
+                for issue_number, start, end in reversed(issue_spans):
+                    issue = buffer[start:end]
+
+                    # write issue file
+                    if per_issue:
+                        with open(issues_folder / f"issue_{issue_number}.bib", "wb") as issue_file:
+                            issue_file.write(issue)
+
+                    # add issue to its year file (issues separated by a new line)
+                    if per_year:
+                        year = issue_year(issue_number)
+                        if year in year_files:
+                            year_files[year].write(b"\n")
+                        else:
+                            year_files[year] = open(years_folder / f"issues_in_year_{year}.bib", "wb")
+                        year_files[year].write(issue)
+            finally:
+                for year_file in year_files.values():
+                    year_file.close()
+
+    if per_issue:
+        print(f"Split {len(issue_spans)} issues into {issues_folder}")
+
+
+def split_bib_per_issue(bib_file_txt = MATHONCO_BIB_FILE):
+    """
+    Split a bib file into separate issues
+    """
+    split_bibliography(bib_file_txt, per_year=False)
 
 
-def split_single_bib_files_per_year(bib_file_txt = Path("res/MathOncoBibliography.bib")):
+def split_single_bib_files_per_year(bib_file_txt = MATHONCO_BIB_FILE, issue_dates_file = ISSUE_DATES_FILE):
     """
     Split a bib file into separate years
     """
-    # generate output folder
-    output_folder = bib_file_txt.parent / "single_years"
-    output_folder.mkdir(exist_ok=True)
+    split_bibliography(bib_file_txt, per_issue=False, issue_dates_file=issue_dates_file)
 
-    # read the bib file
-    with open(bib_file_txt, "r") as f:
-        bib_content = f.read()
 
-    # split the bib file into separate issues
-    issues = bib_content.split("//MathOnco Issue ")[1:][::-1]
-
-    # get issue number
-    issue_numbers = [issue.split("\n")[0] for issue in issues]
-    issue_numbers = np.array([int(n) for n in issue_numbers], dtype=int)
-
-    # re-add the comment at the beginning of each issue
-    issues = [f"//MathOnco Issue {issue}" for issue in issues]
-
-    # set up range of issues per year
-    issues_per_year = {
-        2017: [1, 2],
-        2018: [3, 47],
-        2019: [48, 95],
-        2020: [96, 143],
-        2021: [144, 190],
-        2022: [191, 237],
-        2023: [238, 279],
-        2024: [280, 315],
-        2025: [316, issue_numbers[-1]],
-    }
-
-    for year, issues_range in issues_per_year.items():
-        # get index where the issues start and end
-        start_range = np.nonzero(issue_numbers == issues_range[0])[0][0]
-        stop_range = np.nonzero(issue_numbers == issues_range[1])[0][0]
-        # get the issues for the year
-        issues_for_year = issues[start_range : stop_range + 1]
-
-        # write each issue to a separate file
-        with open(output_folder / f"issues_in_year_{year}.bib", "w") as f:
-            f.write("\n".join(issues_for_year))
-
-
-def count_n_papers_per_year(single_years_folder = Path("res/single_years")):
+def count_n_papers_per_year(bib_file_txt = MATHONCO_BIB_FILE, output_file = Path("out/n_papers_per_year.csv")):
     """
-    Count the number of papers per year
+    Count the number of papers (entries of any type) in the issues of each year, using the catalog
     """
-    n_papers_per_year = []
-    for year_file in single_years_folder.glob("*.bib"):
-        with open(year_file, "r") as f:
-            # read the file 
-            bib_content = f.read()
-        # count the number of papers
-        n_papers = bib_content.count("@article")
-        n_papers_per_year.append({"Year": year_file.stem.split("_")[-1], "n_papers": n_papers})
+    # imported here, the catalog depends on this module
+    from src.catalog import get_catalog
 
     # save the results as csv
-    pandas_df = pd.DataFrame(n_papers_per_year)
-    pandas_df.to_csv("out/n_papers_per_year.csv", index=False)
+    pandas_df = get_catalog(bib_file_txt).n_papers_per_year()
+    Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+    pandas_df.to_csv(output_file, index=False)
 
 
 if __name__ == "__main__":
-    split_bib_per_issue()
-    split_single_bib_files_per_year()
+    split_bibliography()
     count_n_papers_per_year()
\ No newline at end of file